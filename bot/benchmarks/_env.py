@@ -0,0 +1,9 @@
+"""
+Imported first by benchmarks that load the bot's modules. config.py refuses to import without the IDs below,
+and the benchmarks never talk to discord, so placeholders are set where the environment has none.
+Subprocesses started by a benchmark inherit them.
+"""
+import os
+
+os.environ.setdefault("BOT_OWNER_ID", "0")
+os.environ.setdefault("LOG_CHANNEL_ID", "0")
@@ -0,0 +1,61 @@
+"""
+Compares frames per second of PCMVolumeTransformer against DSPAudioSource on synthetic PCM:
+
+  transformer      PCMVolumeTransformer (audioop.mul) at the given volume
+  dsp              DSPAudioSource at the same volume, the default path without normalization
+  dsp-measured     the same, also measuring loudness as it does with normalization on
+  dsp-normalized   DSPAudioSource measuring, with a +6 dB normalization gain on top, so the limiter is busy
+  dsp-unity        DSPAudioSource at unity gain, where frames pass through untouched
+
+Run from the bot directory:
+
+    python -m benchmarks.dsp_volume [frames] [volume]
+"""
+import sys
+import time
+
+import discord
+import numpy as np
+
+from utils.audio_dsp import DSPAudioSource
+
+class SyntheticSource(discord.AudioSource):
+    """Loops over a few seconds of noise with a slow swell, read as 20 ms PCM frames."""
+    def __init__(self, frames):
+        rng = np.random.default_rng(0)
+        swell = np.sin(np.linspace(0, np.pi, 250 * 1920)) ** 2
+        samples = rng.normal(0, 6000, 250 * 1920) * (0.3 + swell)
+        self.frames = [chunk.tobytes() for chunk in np.clip(samples, -32768, 32767).astype(np.int16).reshape(250, 1920)]
+        self.remaining = frames
+
+    def read(self):
+        if self.remaining == 0:
+            return b""
+        self.remaining -= 1
+        return self.frames[self.remaining % len(self.frames)]
+
+def run(source):
+    started = time.perf_counter()
+    frames = 0
+    while source.read():
+        frames += 1
+    source.cleanup()
+    return frames / (time.perf_counter() - started)
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    volume = float(sys.argv[2]) if len(sys.argv) > 2 else 0.8
+    cases = {
+        "transformer": lambda: discord.PCMVolumeTransformer(SyntheticSource(frames), volume=volume),
+        "dsp": lambda: DSPAudioSource(SyntheticSource(frames), volume=volume),
+        "dsp-measured": lambda: DSPAudioSource(SyntheticSource(frames), volume=volume, on_loudness=lambda *_: None),
+        "dsp-normalized": lambda: DSPAudioSource(SyntheticSource(frames), volume=volume, gain_db=6.0, on_loudness=lambda *_: None),
+        "dsp-unity": lambda: DSPAudioSource(SyntheticSource(frames)),
+    }
+    print(f"{frames} frames at volume {volume}; real time is 50 frames/s")
+    for name, make_source in cases.items():
+        fps = run(make_source())
+        print(f"{name:<15} {fps:>10.0f} frames/s  {1000 / fps:>7.3f} ms/frame")
+
+if __name__ == "__main__":
+    main()
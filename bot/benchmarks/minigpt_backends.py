@@ -0,0 +1,90 @@
+"""
+Compares the ?minigpt inference backends on the same prompts: load time, resident memory, single-prompt
+latency and batched throughput. Each backend runs in its own process so memory numbers don't mix.
+Run from the bot directory:
+
+    python -m benchmarks.minigpt_backends [backend ...] [--tokens N]
+
+Backends are torch (float32 PyTorch, the old path), int8 and onnx; all three by default.
+"""
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+import benchmarks._env
+
+MODEL = "distilgpt2"
+PROMPTS = [
+    "The best song to play at a party is",
+    "My favourite band just released",
+    "Explain what a Discord bot does:",
+    "Once upon a time in a small town,",
+    "The weather today is",
+    "Ten tips for learning the guitar:",
+    "Python is a programming language that",
+    "The secret to a good playlist is",
+]
+
+def measure(backend, max_new_tokens):
+    import torch
+    from utils.model_registry import ModelRegistry, _rss_bytes
+
+    rss_start = _rss_bytes()
+    registry = ModelRegistry(backend=backend)
+    started = time.perf_counter()
+    with registry.use(MODEL) as (model, tokenizer):
+        load_seconds = time.perf_counter() - started
+        rss_loaded = _rss_bytes()
+        tokenizer.pad_token = tokenizer.eos_token
+        tokenizer.padding_side = "left"
+        generate = lambda inputs: model.generate(**inputs, max_new_tokens=max_new_tokens, min_new_tokens=max_new_tokens,
+                                                 pad_token_id=tokenizer.pad_token_id)
+        with torch.inference_mode():
+            generate(tokenizer(PROMPTS[0], return_tensors="pt"))  # Warm-up
+            latencies = []
+            for prompt in PROMPTS:
+                started = time.perf_counter()
+                generate(tokenizer(prompt, return_tensors="pt"))
+                latencies.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            generate(tokenizer(PROMPTS, return_tensors="pt", padding=True))
+            batch_seconds = time.perf_counter() - started
+    return {
+        "backend": registry.stats()["models"][MODEL]["backend"],
+        "load_seconds": load_seconds,
+        "model_mib": (rss_loaded - rss_start) / 1048576,
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "latency_median": statistics.median(latencies),
+        "latency_max": max(latencies),
+        "single_tokens_per_second": max_new_tokens / statistics.mean(latencies),
+        "batch_tokens_per_second": len(PROMPTS) * max_new_tokens / batch_seconds,
+    }
+
+def main():
+    args = sys.argv[1:]
+    max_new_tokens = 40
+    if "--tokens" in args:
+        index = args.index("--tokens")
+        max_new_tokens = int(args[index + 1])
+        del args[index:index + 2]
+    if args and args[0] == "--run":
+        print(json.dumps(measure(args[1], max_new_tokens)))
+        return
+
+    print(f"{MODEL}, {len(PROMPTS)} prompts, {max_new_tokens} new tokens each")
+    print(f"{'backend':<8} {'load':>7} {'model':>9} {'peak RSS':>9} {'median':>8} {'max':>8} {'tok/s':>7} {'batch tok/s':>12}")
+    for backend in args or ["torch", "int8", "onnx"]:
+        result = subprocess.run([sys.executable, "-m", "benchmarks.minigpt_backends", "--run", backend, "--tokens", str(max_new_tokens)],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{backend:<8} failed: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else result.returncode}")
+            continue
+        r = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{r['backend']:<8} {r['load_seconds']:>6.1f}s {r['model_mib']:>5.0f} MiB {r['peak_rss_mib']:>5.0f} MiB "
+              f"{r['latency_median']:>7.2f}s {r['latency_max']:>7.2f}s {r['single_tokens_per_second']:>7.1f} {r['batch_tokens_per_second']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
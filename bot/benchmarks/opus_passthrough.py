@@ -0,0 +1,83 @@
+"""
+Compares the CPU cost per stream of the playback paths:
+
+  pcm          ffmpeg decodes to PCM, PCMVolumeTransformer scales each frame and libopus encodes in the bot
+  opus-encode  ffmpeg decodes and encodes to Opus, the bot only forwards packets
+  opus-copy    ffmpeg copies YouTube's Opus packets into Ogg, nothing is decoded
+
+Frames are pulled as fast as the sources produce them, so the numbers are CPU seconds per minute of audio.
+Run from the bot directory:
+
+    python -m benchmarks.opus_passthrough <YouTube link, stream URL or audio file> [seconds]
+"""
+import resource
+import sys
+import time
+
+import discord
+import yt_dlp
+
+FRAME_SECONDS = 0.02
+FFMPEG_OPTIONS = {
+    'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
+    'options': '-vn'
+}
+
+def resolve(target):
+    if "youtube.com" in target or "youtu.be" in target:
+        with yt_dlp.YoutubeDL({"format": "bestaudio/best", "quiet": True, "noplaylist": True}) as ydl:
+            info = ydl.extract_info(target, download=False)
+        return info["url"], info.get("acodec")
+    return target, None
+
+def child_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+def run(make_source, frames, encode):
+    encoder = discord.opus.Encoder() if encode else None
+    children_before = child_cpu()
+    cpu_before = time.process_time()
+    source = make_source()
+    read = 0
+    try:
+        while read < frames:
+            data = source.read()
+            if not data:
+                break
+            if encoder:
+                encoder.encode(data, encoder.SAMPLES_PER_FRAME)
+            read += 1
+    finally:
+        # cleanup() kills and reaps ffmpeg, so its CPU time shows up in RUSAGE_CHILDREN
+        source.cleanup()
+    return read * FRAME_SECONDS, time.process_time() - cpu_before, child_cpu() - children_before
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    url, acodec = resolve(sys.argv[1])
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 60
+    frames = int(seconds / FRAME_SECONDS)
+
+    modes = {
+        "pcm": (lambda: discord.PCMVolumeTransformer(discord.FFmpegPCMAudio(url, **FFMPEG_OPTIONS), volume=1.0), True),
+        "opus-encode": (lambda: discord.FFmpegOpusAudio(url, codec="libopus", **FFMPEG_OPTIONS), False),
+    }
+    if acodec in (None, "opus"):
+        modes["opus-copy"] = (lambda: discord.FFmpegOpusAudio(url, codec="opus", **FFMPEG_OPTIONS), False)
+    else:
+        print(f"Source codec is {acodec}, skipping opus-copy.")
+
+    print(f"{'mode':<12} {'audio s':>8} {'bot cpu s':>10} {'ffmpeg cpu s':>13} {'cpu s/min':>10} {'% core':>7}")
+    for name, (make_source, encode) in modes.items():
+        audio, bot_cpu, ffmpeg_cpu = run(make_source, frames, encode)
+        if not audio:
+            print(f"{name:<12} no audio read")
+            continue
+        total = bot_cpu + ffmpeg_cpu
+        print(f"{name:<12} {audio:>8.1f} {bot_cpu:>10.2f} {ffmpeg_cpu:>13.2f} {total / audio * 60:>10.2f} {total / audio * 100:>6.1f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Measures the memory held by a queue of YTDLSource entries, against the old representation that kept
+yt-dlp's whole info dict on every entry. Info dicts are synthetic but shaped like yt-dlp's output for a
+YouTube video (formats with signed URLs, thumbnails, automatic captions, HTTP headers).
+Run from the bot directory:
+
+    python -m benchmarks.queue_memory [entries]
+"""
+import gc
+import sys
+import tracemalloc
+
+import benchmarks._env
+from cogs.youtube import YTDLSource
+
+def signed_url(video_id, itag, length=700):
+    base = f"https://rr3---sn-4g5e6nsz.googlevideo.com/videoplayback?expire=1760000000&id={video_id}&itag={itag}&sig="
+    return base + (video_id * (length // len(video_id) + 1))[:length - len(base)]
+
+def fake_info(i):
+    video_id = f"{i:011d}"
+    return {
+        "id": video_id,
+        "title": f"Benchmark track {i}",
+        "url": signed_url(video_id, 251),
+        "duration": 180 + i % 240,
+        "acodec": "opus",
+        "webpage_url": f"https://www.youtube.com/watch?v={video_id}",
+        "thumbnail": f"https://i.ytimg.com/vi/{video_id}/maxresdefault.jpg",
+        "description": f"Description of track {i}. " * 40,
+        "tags": [f"tag{i}-{n}" for n in range(20)],
+        "formats": [
+            {"format_id": str(itag), "url": signed_url(video_id, itag), "ext": "webm", "acodec": "opus", "vcodec": "none",
+             "abr": 160, "asr": 48000, "filesize": 3_000_000 + itag, "http_headers": {"User-Agent": "Mozilla/5.0", "Accept": "*/*"}}
+            for itag in range(15)
+        ],
+        "thumbnails": [
+            {"url": f"https://i.ytimg.com/vi/{video_id}/hq{n}.jpg", "preference": n, "id": str(n), "height": 90 + n, "width": 120 + n}
+            for n in range(10)
+        ],
+        "automatic_captions": {
+            f"l{n}": [{"ext": ext, "url": f"https://www.youtube.com/api/timedtext?v={video_id}&lang=l{n}&fmt={ext}&sig={video_id * 8}"} for ext in ("json3", "vtt")]
+            for n in range(10)
+        },
+        "http_headers": {"User-Agent": "Mozilla/5.0", "Accept": "*/*", "Accept-Language": "en-us,en;q=0.5"},
+    }
+
+class FullDictSource:
+    """The old representation: the attributes YTDLSource reads plus the whole info dict."""
+    def __init__(self, data):
+        self.data = data
+        self.title = data.get("title")
+        self.url = data.get("url")
+        self.duration = data.get("duration")
+        self.thumbnail = data.get("thumbnail")
+        self.webpage_url = data.get("webpage_url")
+
+def measure(cls, entries):
+    gc.collect()
+    tracemalloc.start()
+    infos = [fake_info(i) for i in range(entries)]
+    queue = [cls(info) for info in infos]
+    del infos
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del queue
+    return current
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print(f"Queue of {entries} resolved entries")
+    results = {}
+    for name, cls in (("full info dict", FullDictSource), ("slim YTDLSource", YTDLSource)):
+        results[name] = measure(cls, entries)
+        print(f"{name:<16} {results[name] / 1048576:>8.1f} MiB  {results[name] / entries / 1024:>7.1f} KiB/entry")
+    print(f"Reduction: {results['full info dict'] / max(results['slim YTDLSource'], 1):.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Measures what each extension costs at startup: the time to import it in a fresh interpreter, where nothing
+is cached yet, and the heaviest modules it pulls in. Run from the bot directory:
+
+    python -m benchmarks.startup_imports [module ...]
+
+Modules default to the cogs bot.py loads and the AI stack that cogs.ai defers to the first ?minigpt.
+"""
+import subprocess
+import sys
+
+import benchmarks._env
+
+MODULES = ["discord", "cogs.admin", "cogs.music", "cogs.ai", "torch", "transformers"]
+
+def import_times(module):
+    """Returns (total seconds, [(seconds, module name)] of its heaviest imports) from python -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    total, children, top = None, [], []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package, indented two spaces per level of nesting
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        seconds = int(cumulative) / 1e6
+        if not name.startswith("  "):
+            # A module imported by the -c line itself; the ones listed before it are what it imported
+            if name.strip() == module:
+                total, top = seconds, children
+            children = []
+        elif not name.startswith("    "):
+            children.append((seconds, name.strip()))
+    if total is None:
+        raise RuntimeError(f"{module} was already imported at interpreter startup")
+    top = sorted(top, reverse=True)
+    return total, top[:5]
+
+def main():
+    for module in sys.argv[1:] or MODULES:
+        try:
+            total, top = import_times(module)
+        except RuntimeError as e:
+            print(f"{module:<14} failed: {e}")
+            continue
+        print(f"{module:<14} {total:>6.2f}s  " + ", ".join(f"{name} {seconds:.2f}s" for seconds, name in top))
+
+if __name__ == "__main__":
+    main()
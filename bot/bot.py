@@ -1,4 +1,7 @@
 #!/usr/bin/env python3
+import time
+STARTED = time.perf_counter()  # The startup profile is measured from here
+
 import asyncio
 import os
 import discord
@@ -6,6 +9,7 @@ from discord.ext import commands
 import config
 import logging
 from utils.discord_log_handler import DiscordLogHandler
+from utils.startup import StartupProfile, LazyExtensions
 
 # Configure logging
 logging.basicConfig(
@@ -23,6 +27,13 @@ intents.voice_states = True
 
 bot = commands.Bot(command_prefix=config.COMMAND_PREFIX, intents=intents, owner_id=config.BOT_OWNER_ID)
 
+startup_profile = StartupProfile(STARTED, target=config.STARTUP_TARGET_SECONDS)
+startup_profile.record("import", time.perf_counter() - STARTED)
+lazy_extensions = LazyExtensions(bot, config.LAZY_EXTENSIONS, commands=config.LAZY_EXTENSION_COMMANDS, profile=startup_profile)
+# Shown by ?perfstats
+bot.startup_profile = startup_profile
+bot.lazy_extensions = lazy_extensions
+
 discord_log_handler = None # Initialize as None, will be set in on_ready
 
 @bot.event
@@ -32,6 +43,12 @@ async def on_ready():
     logging.info(f"Intents: {bot.intents}")
     logging.info('------')
 
+    if startup_profile.mark_ready():
+        logging.info(f"Startup: {startup_profile.summary()}")
+        if startup_profile.target and startup_profile.ready_after > startup_profile.target:
+            logging.warning(f"Startup took {startup_profile.ready_after:.2f}s, over the {startup_profile.target:.1f}s time-to-first-command target.")
+        lazy_extensions.warm_up(config.LAZY_EXTENSIONS_WARMUP_DELAY)
+
     # Initialize and add DiscordLogHandler after bot is ready
     if config.LOG_CHANNEL_ID and config.LOG_CHANNEL_ID != "YOUR_LOG_CHANNEL_ID":
         discord_log_handler = DiscordLogHandler(bot, config.LOG_CHANNEL_ID)
@@ -40,6 +57,18 @@ async def on_ready():
     else:
         logging.warning("LOG_CHANNEL_ID is not set in config.py. Discord logging will be disabled.")
 
+@bot.event
+async def on_message(message):
+    if message.author.bot:
+        return
+    ctx = await bot.get_context(message)
+    # Commands of a lazy extension that hasn't been loaded yet load it; other unknown commands load nothing
+    extension = lazy_extensions.extension_for(ctx.invoked_with) if ctx.command is None and ctx.invoked_with else None
+    if extension is not None:
+        await lazy_extensions.load(extension)
+        ctx = await bot.get_context(message)
+    await bot.invoke(ctx)
+
 async def main():
     # Create an audio cache directory
     audio_cache_dir = "audio_cache"
@@ -60,21 +89,20 @@ async def main():
         logging.info(f"yt-dlp cache directory already exists: {cache_dir}")
 
     async with bot:
-        for filename in os.listdir('./cogs'):
+        for filename in sorted(os.listdir('./cogs')):
             if filename.endswith('.py') and filename != '__init__.py' and filename != 'youtube.py' and filename != 'logging.py':
+                # Lazy extensions (cogs.ai by default) are loaded after startup, see LAZY_EXTENSIONS in config.py
+                if f'cogs.{filename[:-3]}' in lazy_extensions.pending:
+                    continue
                 try:
-                    await bot.load_extension(f'cogs.{filename[:-3]}')
+                    with startup_profile.phase(f'cog {filename[:-3]}'):
+                        await bot.load_extension(f'cogs.{filename[:-3]}')
                     logging.info(f'Successfully loaded extension: {filename}')
                 except Exception as e:
                     logging.error(f'Failed to load extension {filename}: {e}')
-        
-        try:
-            await bot.load_extension('cogs.ai')
-            logging.info('Successfully loaded extension: ai.py')
-        except Exception as e:
-            logging.error(f'Failed to load extension ai.py: {e}')
-        
+
         try:
+            startup_profile.connecting()
             await bot.start(config.DISCORD_TOKEN)
         except discord.errors.LoginFailure:
             logging.error("Error: Invalid Discord Token. Please check your DISCORD_TOKEN in config.py.")
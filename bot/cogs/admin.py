@@ -76,8 +76,8 @@ class Admin(commands.Cog):
                     logging.info(f"Successfully wrote {len(cookie_lines)} cookie lines to youtube_cookie.txt")
                     
                     from cogs import youtube
-                    youtube.YTDL_FORMAT_OPTIONS["cookiefile"] = "youtube_cookie.txt"
-                    logging.info("Updated yt_dlp cookiefile option.")
+                    youtube.ytdl_pool.refresh()
+                    logging.info("Refreshed yt_dlp extractor pool with new cookies.")
 
                     await ctx.send(embed=self.create_embed("Cookies Set", f"{config.SUCCESS_EMOJI} Successfully fetched and set cookies from `{url}` to `youtube_cookie.txt`."))
 
@@ -106,6 +106,78 @@ class Admin(commands.Cog):
         await self.bot.close()
         logging.info("Bot is attempting to restart.")
 
+    @commands.command(name="perfstats")
+    @commands.is_owner()
+    async def perfstats(self, ctx):
+        """Shows cache and pool counters for the music backend."""
+        from cogs import youtube
+        from utils.crossfade_mixer import CrossfadeMixer
+        pool_stats = youtube.ytdl_pool.stats()
+        idle = ", ".join(f"{profile}: {count}" for profile, count in pool_stats["idle"].items())
+        cache_stats = youtube.resolution_cache.stats()
+        lines = [
+            f"**yt-dlp pool**: {pool_stats['hits']} hits, {pool_stats['misses']} misses, {pool_stats['refreshes']} refreshes (idle: {idle})",
+            f"**Resolution cache**: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} entries, {cache_stats['bytes'] // 1024} KiB, {cache_stats['evictions']} evictions",
+        ]
+        executor = youtube.extraction_executor
+        depths = executor.queue_depths()
+        for name, stats in executor.stats.items():
+            started = stats["completed"] + stats["failed"]
+            avg_wait = stats["total_wait"] / started if started else 0.0
+            lines.append(f"**Extraction ({name})**: {depths[name]} queued, {started} run, avg wait {avg_wait:.2f}s, max wait {stats['max_wait']:.2f}s")
+        lines.append(f"**Extraction workers**: {executor.running}/{executor.workers} busy ({config.EXTRACTION_MODE} mode)")
+        audio_stats = youtube.audio_cache.stats()
+        lines.append(f"**Audio cache**: {audio_stats['hits']} hits, {audio_stats['misses']} misses, {audio_stats['files']} files, {audio_stats['bytes'] // 1048576} MiB, {audio_stats['evictions']} evictions")
+        predownload_stats = youtube.predownloader.stats
+        if config.LOUDNESS_NORMALIZATION:
+            analyzer_stats = youtube.loudness_analyzer.stats
+            lines.append(f"**Loudness analysis**: {youtube.loudness_store.count()} tracks measured, {analyzer_stats['analyzed']} by ebur128, {analyzer_stats['failed']} failed, {youtube.loudness_analyzer.pending()} pending")
+        lines.append(f"**Background downloads**: {predownload_stats['completed']} done, {predownload_stats['failed']} failed, {youtube.predownloader.pending()} pending, {predownload_stats['deduplicated']} deduplicated")
+        music = self.bot.get_cog("Music")
+        if music:
+            transitions = music.transition_stats
+            avg_gap = transitions["total_gap_ms"] / transitions["count"] if transitions["count"] else 0.0
+            lines.append(f"**Track transitions**: {transitions['count']} ({transitions['prefetched']} prefetched), avg gap {avg_gap:.0f} ms, max gap {transitions['max_gap_ms']:.0f} ms")
+            lines.append(f"**Players created**: {music.player_modes['opus']} Opus passthrough, {music.player_modes['pcm']} PCM")
+            mixer_stats = CrossfadeMixer.stats
+            if mixer_stats["frames"]:
+                avg_frame = mixer_stats["total_ms"] / mixer_stats["frames"]
+                avg_fade = mixer_stats["fade_total_ms"] / mixer_stats["fade_frames"] if mixer_stats["fade_frames"] else 0.0
+                lines.append(f"**Crossfade mixer**: {mixer_stats['transitions']} transitions, CPU avg {avg_frame:.3f} ms/frame ({avg_fade:.3f} ms while fading), max {mixer_stats['max_ms']:.2f} ms of the 20 ms frame")
+            expiry = music.expiry_stats
+            lines.append(f"**Stream URL refreshes**: {expiry['batch']} batched, {expiry['prefetch']} at prefetch, {expiry['just_in_time']} just in time, {expiry['saved']} plays saved")
+            search_stats = music.youtube_search.stats()
+            lines.append(f"**YouTube search**: {search_stats['hits']} cache hits, {search_stats['requests']} API requests, quota {search_stats['quota_used']}/{search_stats['daily_quota']} ({search_stats['quota_day']})")
+            np_stats = music.nowplaying_scheduler.stats
+            lines.append(f"**Nowplaying updates**: {np_stats['updates']} ({np_stats['skipped']} unchanged, skipped), {np_stats['rest_calls']} REST calls, {np_stats['rest_calls_saved']} saved")
+        from utils.model_registry import model_registry
+        registry = model_registry.stats()
+        models = ", ".join(f"{name} [{model['backend']}] {model['memory_bytes'] // 1048576} MiB ({model['uses']} uses, idle {model['idle_seconds']:.0f}s)"
+                           for name, model in registry["models"].items()) or "none loaded"
+        lines.append(f"**Models**: {models}; {registry['loads']} loads, {registry['unloads']} unloads, "
+                     f"prompt cache {registry['cache']['hits']} hits, {registry['cache']['misses']} misses")
+        ai = self.bot.get_cog("AI")
+        if ai:
+            inference = ai.inference.stats
+            avg_latency = inference["total_latency"] / inference["requests"] if inference["requests"] else 0.0
+            avg_batch = inference["requests"] / inference["batches"] if inference["batches"] else 0.0
+            tokens_per_second = inference["tokens"] / inference["generate_seconds"] if inference["generate_seconds"] else 0.0
+            lines.append(f"**MiniGPT inference**: {inference['requests']} prompts in {inference['batches']} batches (avg {avg_batch:.1f}), {inference['cached']} cached, "
+                         f"avg latency {avg_latency:.2f}s, max {inference['max_latency']:.2f}s, {tokens_per_second:.1f} tokens/s, "
+                         f"{ai.inference.pending()} queued, {inference['rejected']} rejected")
+            streams = ai.stream_stats
+            avg_ttfvt = streams["total_ttfvt"] / streams["streams"] if streams["streams"] else 0.0
+            avg_first_token = inference["total_first_token"] / inference["streams"] if inference["streams"] else 0.0
+            lines.append(f"**MiniGPT streaming**: {streams['streams']} streams, avg time to first visible text {avg_ttfvt:.2f}s "
+                         f"(max {streams['max_ttfvt']:.2f}s, first token {avg_first_token:.2f}s), {streams['edits']} edits, "
+                         f"{streams['cancelled']} cancelled by deletion")
+        startup = getattr(self.bot, "startup_profile", None)
+        if startup:
+            lazy = self.bot.lazy_extensions.pending
+            lines.append(f"**Startup**: {startup.summary()}" + (f", not loaded yet: {', '.join(lazy)}" if lazy else ""))
+        logging.info(f"perfstats command invoked by {ctx.author}")
+        await ctx.send(embed=self.create_embed("Performance Stats", "\n".join(lines)))
+
     def create_embed(self, title, description, color=discord.Color.blurple()):
         return discord.Embed(title=title, description=description, color=color)
 
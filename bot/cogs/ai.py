@@ -1,10 +1,15 @@
+import asyncio
 import os
 import inspect
+import time
 import traceback
+import discord
 from discord.ext import commands
 import config
 import logging
-from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from utils.inference_service import InferenceService, InferenceQueueFull
+from utils.model_registry import model_registry
 
 class AIError(Exception):
     """Custom exception for AI-related errors."""
@@ -13,28 +18,89 @@ class AIError(Exception):
 class AICog(commands.Cog, name="AI"):
     def __init__(self, bot):
         self.bot = bot
+        # DistilGPT-2 is loaded by the shared model registry on the first ?minigpt, and generate() runs on
+        # the service's worker thread, never on the event loop
+        self.inference = InferenceService(model_registry, "distilgpt2", max_batch=config.INFERENCE_MAX_BATCH,
+                                          max_wait=config.INFERENCE_MAX_WAIT_MS / 1000, max_queue=config.INFERENCE_MAX_QUEUE)
+        # Message ID -> event set when a message that is still being streamed into gets deleted
+        self.active_streams = {}
+        # ttfvt: time from the command to the first generated text the user can see
+        self.stream_stats = {"streams": 0, "cancelled": 0, "edits": 0, "total_ttfvt": 0.0, "max_ttfvt": 0.0}
+
+    def cog_unload(self):
+        self.inference.close()
+
+    async def _stream_minigpt(self, ctx, prompt, started):
+        stats = self.stream_stats
+        stats["streams"] += 1
+        chunks = self.inference.stream(prompt, max_new_tokens=config.MINIGPT_MAX_NEW_TOKENS)
+        text = prompt
+        message = None
         try:
-            self.minigpt_tokenizer = AutoTokenizer.from_pretrained("distilgpt2")
-            self.minigpt_model = AutoModelForCausalLM.from_pretrained("distilgpt2")
-        except Exception as e:
-            logging.error(f"Failed to load DistilGPT-2 model: {e}", exc_info=True)
-            self.minigpt_model = None
-            self.minigpt_tokenizer = None
+            # The first message goes out with the first visible text rather than waiting for an edit slot
+            async with ctx.typing():
+                async for chunk in chunks:
+                    text += chunk
+                    if chunk.strip():
+                        break
+            message = await ctx.send(text[:2000])
+            ttfvt = time.perf_counter() - started
+            stats["total_ttfvt"] += ttfvt
+            stats["max_ttfvt"] = max(stats["max_ttfvt"], ttfvt)
+            deleted = self.active_streams[message.id] = asyncio.Event()
+            shown = text[:2000]
+            last_edit = time.monotonic()
+            async for chunk in chunks:
+                if deleted.is_set():
+                    break
+                text += chunk
+                # Edits are throttled to stay well inside discord's rate limit; the text in between piles up
+                if time.monotonic() - last_edit >= config.MINIGPT_EDIT_INTERVAL and text[:2000] != shown:
+                    shown = text[:2000]
+                    await self._edit_stream(message, shown, deleted)
+                    last_edit = time.monotonic()
+            if not deleted.is_set() and text[:2000] != shown:
+                await self._edit_stream(message, text[:2000], deleted)
+            if deleted.is_set():
+                stats["cancelled"] += 1
+        finally:
+            # Stops generation at the next token if the loop ended early
+            await chunks.aclose()
+            if message is not None:
+                self.active_streams.pop(message.id, None)
+
+    async def _edit_stream(self, message, content, deleted):
+        try:
+            await message.edit(content=content)
+            self.stream_stats["edits"] += 1
+        except discord.NotFound:
+            deleted.set()
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload):
+        deleted = self.active_streams.get(payload.message_id)
+        if deleted is not None:
+            deleted.set()
 
     @commands.command()
     async def minigpt(self, ctx, *, prompt: str):
         """
         Generates text using a local GPT model.
         """
-        if not self.minigpt_model or not self.minigpt_tokenizer:
-            await ctx.send("The MiniGPT model is not available. Please check the logs for errors.")
-            return
-
+        started = time.perf_counter()
         try:
-            inputs = self.minigpt_tokenizer(prompt, return_tensors="pt")
-            outputs = self.minigpt_model.generate(**inputs, max_length=50)
-            response = self.minigpt_tokenizer.decode(outputs[0], skip_special_tokens=True)
+            if config.MINIGPT_STREAMING:
+                await self._stream_minigpt(ctx, prompt, started)
+                return
+            async with ctx.typing():
+                response = await self.inference.generate(prompt, max_new_tokens=config.MINIGPT_MAX_NEW_TOKENS)
             await ctx.send(response)
+        except InferenceQueueFull:
+            await ctx.send("MiniGPT is busy with other prompts right now. Please try again in a moment.")
+        except OSError as e:
+            # from_pretrained could not find or download the weights
+            logging.error(f"Failed to load DistilGPT-2 model: {e}", exc_info=True)
+            await ctx.send("The MiniGPT model is not available. Please check the logs for errors.")
         except Exception as e:
             logging.error(f"Error in minigpt command: {e}", exc_info=True)
             await ctx.send("An error occurred while generating text with MiniGPT.")
@@ -85,17 +151,6 @@ class AICog(commands.Cog, name="AI"):
             logging.error(f"Error in view_files command: {e}", exc_info=True)
             await ctx.send(f"An error occurred: {e}")
 
-
-    @commands.Cog.listener()
-    async def on_command_error(self, ctx, error):
-        if isinstance(error, commands.MissingRequiredArgument):
-            await ctx.send(f"You're missing a required argument: `{error.param.name}`")
-        elif isinstance(error, commands.CommandInvokeError) and isinstance(error.original, AIError):
-            # This is handled in the command itself, but we can add a general fallback.
-            pass
-        else:
-            logging.error(f"Unhandled command error in AICog: {error}", exc_info=True)
-            
 async def setup(bot):
     try:
         await bot.add_cog(AICog(bot))
@@ -0,0 +1,20 @@
+from discord.ext import commands
+import logging
+
+class CommandErrors(commands.Cog, name="Errors"):
+    """
+    The bot-wide command error handler. It lives in its own small cog so it is loaded at startup,
+    even while cogs in LAZY_EXTENSIONS are not.
+    """
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.Cog.listener()
+    async def on_command_error(self, ctx, error):
+        if isinstance(error, commands.MissingRequiredArgument):
+            await ctx.send(f"You're missing a required argument: `{error.param.name}`")
+        else:
+            logging.error(f"Unhandled command error: {error}", exc_info=True)
+
+async def setup(bot):
+    await bot.add_cog(CommandErrors(bot))
@@ -1,14 +1,21 @@
 import asyncio
 import discord
 from discord.ext import commands
-from googleapiclient.discovery import build
-import random
 import logging
+import re
 import time
 
 import config
 
-from cogs.youtube import YTDLSource, FFMPEG_OPTIONS
+from cogs.youtube import YTDLSource, FFMPEG_OPTIONS, resolution_cache, audio_cache, predownloader
+from cogs.youtube import loudness_store, loudness_analyzer
+from cogs.youtube import start_extraction_processes, shutdown_extraction_processes
+from utils.extraction_executor import INTERACTIVE, PREFETCH, BULK
+from utils.crossfade_mixer import CrossfadeMixer
+from utils.audio_dsp import DSPAudioSource, loudness_gain
+from utils.playlist import GuildPlaylist
+from utils.nowplaying_scheduler import NowPlayingScheduler
+from utils.youtube_search import YouTubeSearch, SearchQuotaExceeded
 
 class Music(commands.Cog):
     def __init__(self, bot):
@@ -22,15 +29,67 @@ class Music(commands.Cog):
         self.youtube_speeds = [0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0]
         self.looping = {}
         self.song_start_time = {}
-        self.nowplaying_tasks = {}
+        self.song_offset = {}
+        self.nowplaying_rendered = {}
+        self.nowplaying_view = None
+        self.nowplaying_scheduler = NowPlayingScheduler(self._refresh_nowplaying, interval=config.NOWPLAYING_UPDATE_INTERVAL)
+        self.paused_at = {}
+        self.youtube_search = YouTubeSearch(config.YOUTUBE_API_KEY, daily_quota=config.YOUTUBE_API_DAILY_QUOTA,
+                                            cache_ttl=config.YOUTUBE_SEARCH_CACHE_TTL, cache_size=config.YOUTUBE_SEARCH_CACHE_SIZE)
         self.current_volume = {}
         self.inactivity_timers = {}
+        self.prefetched = {}
+        self.prefetch_tasks = {}
+        self.track_ended_at = {}
+        self.transition_stats = {"count": 0, "prefetched": 0, "total_gap_ms": 0.0, "max_gap_ms": 0.0}
+        self.expiry_stats = {"batch": 0, "prefetch": 0, "just_in_time": 0, "saved": 0}
+        self.queue_page_size = 10
+        self.player_modes = {"opus": 0, "pcm": 0}
+        self.crossfade = {}
+
+    async def cog_load(self):
+        resolution_cache.load()
+        self.nowplaying_scheduler.start()
+        if config.EXTRACTION_MODE == "process":
+            start_extraction_processes()
+
+    def cog_unload(self):
+        # Persist resolved tracks so they survive ?restart
+        resolution_cache.save()
+        self.nowplaying_scheduler.stop()
+        self.youtube_search.close()
+        predownloader.clear()
+        audio_cache.close()
+        loudness_store.close()
+        shutdown_extraction_processes()
+        for guild_id in list(self.prefetched) + list(self.prefetch_tasks):
+            self._discard_prefetch(guild_id)
 
     async def get_queue(self, guild_id):
         if guild_id not in self.song_queues:
-            self.song_queues[guild_id] = asyncio.Queue()
+            self.song_queues[guild_id] = GuildPlaylist()
         return self.song_queues[guild_id]
 
+    def _format_duration(self, seconds):
+        if seconds is None:
+            return "?:??"
+        seconds = int(seconds)
+        if seconds >= 3600:
+            return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+        return f"{seconds // 60}:{seconds % 60:02d}"
+
+    def _queue_page_embed(self, queue, page):
+        page_count = max(1, -(-len(queue) // self.queue_page_size))
+        page = max(1, min(page, page_count))
+        start = (page - 1) * self.queue_page_size
+        queue_text = "\n".join(
+            f"**{start + i + 1}.** {item.title} `({self._format_duration(item.duration)})`"
+            for i, item in enumerate(queue.slice(start, start + self.queue_page_size))
+        )
+        embed = self.create_embed(f"{config.QUEUE_EMOJI} Current Queue", queue_text)
+        embed.set_footer(text=f"Page {page}/{page_count} | {len(queue)} songs | Total Duration: {self._format_duration(queue.total_duration)}")
+        return embed
+
     def create_embed(self, title, description, color=discord.Color.blurple(), **kwargs):
         embed = discord.Embed(title=title, description=description, color=color)
         for key, value in kwargs.items():
@@ -79,11 +138,11 @@ class Music(commands.Cog):
         if ctx.voice_client:
             await ctx.voice_client.disconnect()
             logging.info(f"Bot disconnected from voice channel in {ctx.guild.name}")
+            self._discard_prefetch(ctx.guild.id)
+            predownloader.cancel_guild(ctx.guild.id)
             
-            # Cancel nowplaying update task
-            if ctx.guild.id in self.nowplaying_tasks and self.nowplaying_tasks[ctx.guild.id] and not self.nowplaying_tasks[ctx.guild.id].done():
-                self.nowplaying_tasks[ctx.guild.id].cancel()
-                del self.nowplaying_tasks[ctx.guild.id]
+            # Stop nowplaying updates
+            self.nowplaying_scheduler.untrack(ctx.guild.id)
 
             await ctx.send(embed=self.create_embed("Left Channel", f"{config.SUCCESS_EMOJI} Successfully disconnected from the voice channel."))
         else:
@@ -97,14 +156,8 @@ class Music(commands.Cog):
             logging.error("YouTube API key is not set.")
             return await ctx.send(embed=self.create_embed("Error", f"{config.ERROR_EMOJI} YouTube API key is not set.", discord.Color.red()))
         try:
-            youtube_service = build("youtube", "v3", developerKey=config.YOUTUBE_API_KEY)
-            search_response = youtube_service.search().list(q=query, part="snippet", maxResults=10, type="video").execute()
-            
-            if not search_response:
-                logging.warning(f"YouTube API returned empty response for query: {query}")
-                return await ctx.send(embed=self.create_embed("Search Error", "The YouTube API returned an empty response. Please check your API key.", discord.Color.red()))
-
-            videos = [(item["snippet"]["title"], item["id"]["videoId"]) for item in search_response.get("items", [])]
+            async with ctx.typing():
+                videos = await self.youtube_search.search(query, max_results=10)
             if not videos:
                 logging.info(f"No videos found for query: {query}")
                 return await ctx.send(embed=self.create_embed("No Results", f"{config.ERROR_EMOJI} No songs found for your query.", discord.Color.orange()))
@@ -112,6 +165,9 @@ class Music(commands.Cog):
             response = "\n".join(f"**{i+1}.** {title}" for i, (title, _) in enumerate(videos))
             logging.info(f"Found {len(videos)} search results for query: {query}")
             await ctx.send(embed=self.create_embed("Search Results", response))
+        except SearchQuotaExceeded as e:
+            logging.warning(f"Search quota exceeded for query '{query}': {e}")
+            await ctx.send(embed=self.create_embed("Search Unavailable", f"{config.ERROR_EMOJI} The daily YouTube search quota has been used up. You can still use `?play` with a URL or search terms.", discord.Color.orange()))
         except Exception as e:
             logging.error(f"Error in search command for query '{query}': {e}")
             await ctx.send(embed=self.create_embed("Search Error", f"An error occurred: {e}", discord.Color.red()))
@@ -137,7 +193,7 @@ class Music(commands.Cog):
 
             async with ctx.typing():
                 logging.info(f"Attempting to get YTDLSource from URL: {url}")
-                result = await YTDLSource.from_url(url, loop=self.bot.loop)
+                result = await YTDLSource.from_url(url, loop=self.bot.loop, guild_id=ctx.guild.id)
                 logging.info(f"YTDLSource.from_url returned type: {type(result)}, content: {result}")
 
                 if not result:
@@ -146,13 +202,13 @@ class Music(commands.Cog):
 
                 if isinstance(result, list):
                     logging.info(f"YTDLSource.from_url returned a list. Number of entries: {len(result)}")
+                    queue.extend(result)
                     for entry in result:
-                        await queue.put(entry)
                         logging.info(f"Added {entry.title} to queue.")
                     await ctx.send(embed=self.create_embed("Playlist Added", f"{config.QUEUE_EMOJI} Added {len(result)} songs to the queue."))
                 else:
                     logging.info("Found single entry.")
-                    await queue.put(result)
+                    queue.append(result)
                     await ctx.send(embed=self.create_embed("Song Added", f"{config.QUEUE_EMOJI} Added `{result.title}` to the queue."))
 
             if not ctx.voice_client.is_playing():
@@ -161,10 +217,66 @@ class Music(commands.Cog):
                     self.inactivity_timers[ctx.guild.id].cancel()
                     del self.inactivity_timers[ctx.guild.id]
                 await self.play_next(ctx)
+            else:
+                self._ensure_prefetch(ctx.guild.id)
         except Exception as e:
             logging.error(f"Error in play command: {e}")
             await ctx.send(embed=self.create_embed("Error", f"An error occurred: {e}", discord.Color.red()))
 
+    def _split_playmany(self, text):
+        """One request per line, without list markers. A single line of several URLs is split on spaces and commas."""
+        lines = [re.sub(r"^(?:[-*•]|\d+[.)])\s+", "", line.strip()).strip("<>") for line in text.splitlines()]
+        lines = [line for line in lines if line]
+        if len(lines) == 1:
+            parts = [part.strip("<>") for part in re.split(r"[\s,]+", lines[0]) if part]
+            if len(parts) > 1 and all("://" in part for part in parts):
+                return parts
+        return lines
+
+    @commands.command(name="playmany")
+    async def playmany(self, ctx, *, items):
+        logging.info(f"Playmany command received from {ctx.author} in {ctx.guild.name}")
+        if not ctx.author.voice:
+            logging.warning("User not in a voice channel.")
+            return await ctx.send(embed=self.create_embed("Error", f"{config.ERROR_EMOJI} You must be in a voice channel to play music.", discord.Color.red()))
+
+        requests = self._split_playmany(items)
+        if len(requests) > config.PLAYMANY_MAX_ITEMS:
+            return await ctx.send(embed=self.create_embed("Error", f"{config.ERROR_EMOJI} You can add at most {config.PLAYMANY_MAX_ITEMS} songs at once.", discord.Color.red()))
+
+        if not ctx.voice_client:
+            logging.info("Bot not in a voice channel, joining.")
+            await ctx.author.voice.channel.connect()
+
+        queue = await self.get_queue(ctx.guild.id)
+        try:
+            async with ctx.typing():
+                songs, errors = await YTDLSource.from_urls(requests, loop=self.bot.loop, guild_id=ctx.guild.id, concurrency=config.PLAYMANY_CONCURRENCY)
+                logging.info(f"Playmany resolved {len(songs)} songs with {len(errors)} errors for {ctx.guild.name}")
+
+                if songs:
+                    queue.extend(songs)
+                    await ctx.send(embed=self.create_embed("Songs Added", f"{config.QUEUE_EMOJI} Added {len(songs)} songs to the queue from {len(requests) - len(errors)} of {len(requests)} requests."))
+                if errors:
+                    shown = "\n".join(f"- {error[:150]}" for error in errors[:10])
+                    if len(errors) > 10:
+                        shown += f"\n...and {len(errors) - 10} more"
+                    await ctx.send(embed=self.create_embed("Some Songs Failed", f"{config.ERROR_EMOJI} Could not load {len(errors)} of {len(requests)} requests:\n{shown}", discord.Color.orange()))
+                if not songs:
+                    return
+
+            if not ctx.voice_client.is_playing():
+                logging.info("Voice client not playing, starting playback.")
+                if ctx.guild.id in self.inactivity_timers:
+                    self.inactivity_timers[ctx.guild.id].cancel()
+                    del self.inactivity_timers[ctx.guild.id]
+                await self.play_next(ctx)
+            else:
+                self._ensure_prefetch(ctx.guild.id)
+        except Exception as e:
+            logging.error(f"Error in playmany command: {e}")
+            await ctx.send(embed=self.create_embed("Error", f"An error occurred: {e}", discord.Color.red()))
+
     @commands.command(name="playlist")
     async def playlist(self, ctx, *, url):
         logging.info(f"Playlist command received with URL: {url}")
@@ -180,7 +292,7 @@ class Music(commands.Cog):
         try:
             async with ctx.typing():
                 logging.info(f"Attempting to get YTDLSource from playlist URL: {url}")
-                result = await YTDLSource.from_url(url, loop=self.bot.loop)
+                result = await YTDLSource.from_url(url, loop=self.bot.loop, guild_id=ctx.guild.id)
                 logging.info(f"YTDLSource.from_url returned type for playlist: {type(result)}, content: {result}")
 
                 if not result or not isinstance(result, list):
@@ -191,14 +303,14 @@ class Music(commands.Cog):
                 remaining_songs = result[1:]
 
                 # Play the first song immediately
-                await queue.put(first_song)
+                queue.append(first_song)
                 logging.info(f"Added {first_song.title} to queue from playlist (first song).")
                 added_count = 1
 
                 # Add remaining songs to the queue
+                queue.extend(remaining_songs)
+                added_count += len(remaining_songs)
                 for entry in remaining_songs:
-                    await queue.put(entry)
-                    added_count += 1
                     logging.info(f"Added {entry.title} to queue from playlist.")
                 
                 if added_count > 0:
@@ -212,39 +324,373 @@ class Music(commands.Cog):
                     self.inactivity_timers[ctx.guild.id].cancel()
                     del self.inactivity_timers[ctx.guild.id]
                 await self.play_next(ctx)
+            else:
+                self._ensure_prefetch(ctx.guild.id)
         except Exception as e:
             logging.error(f"Error in playlist command: {e}")
             await ctx.send(embed=self.create_embed("Error", f"An error occurred: {e}", discord.Color.red()))
 
+    async def _next_playable(self, ctx, queue):
+        """Pops queue entries until one resolves to a playable stream, skipping dead playlist entries."""
+        while not queue.empty():
+            data = queue.popleft()
+            if data.use_local_copy() or data.resolved:
+                return data
+            try:
+                logging.info(f"Resolving lazy playlist entry {data.title} before playback")
+                return await data.resolve(loop=self.bot.loop, guild_id=ctx.guild.id)
+            except Exception as e:
+                logging.warning(f"Skipping playlist entry {data.title} in {ctx.guild.name}: {e}")
+                await ctx.send(embed=self.create_embed("Song Skipped", f"{config.ERROR_EMOJI} Could not load `{data.title}`, skipping it.", discord.Color.orange()))
+        return None
+
+    async def _resolve_ahead(self, guild_id):
+        """
+        Resolves the next few lazy playlist entries while the current track plays, and re-resolves in one
+        batch any stream URLs in the upcoming window that would expire before their song finishes.
+        """
+        queue = await self.get_queue(guild_id)
+        upcoming = [entry for entry in queue.slice(0, config.PLAYLIST_RESOLVE_AHEAD) if not entry.resolved]
+        for entry in upcoming:
+            try:
+                await entry.resolve(loop=self.bot.loop, priority=BULK, guild_id=guild_id)
+            except Exception as e:
+                # play_next will skip it when it reaches the front of the queue
+                logging.warning(f"_resolve_ahead: Could not resolve {entry.title}: {e}")
+
+        expiring = []
+        speed = self.playback_speed.get(guild_id, 1.0)
+        starts_in = self._seconds_until_track_end(guild_id) or 0
+        for entry in queue:
+            if starts_in > config.STREAM_URL_REFRESH_WINDOW:
+                break
+            if self._needs_refresh(guild_id, entry, starts_in):
+                expiring.append((entry, starts_in))
+            starts_in += (entry.duration or 0) / speed
+        if expiring:
+            logging.info(f"_resolve_ahead: Re-resolving {len(expiring)} expiring stream URL(s) for guild {guild_id}")
+            results = await asyncio.gather(
+                *(self._refresh_stream_url(entry, guild_id, starts_in, priority=BULK, reason="batch") for entry, starts_in in expiring),
+                return_exceptions=True,
+            )
+            for (entry, _), result in zip(expiring, results):
+                if isinstance(result, Exception):
+                    logging.warning(f"_resolve_ahead: Could not re-resolve {entry.title}: {result}")
+
+    def _finishes_at(self, guild_id, entry, starts_in):
+        return time.time() + starts_in + (entry.duration or 0) / self.playback_speed.get(guild_id, 1.0)
+
+    def _needs_refresh(self, guild_id, entry, starts_in=0):
+        """True if the entry's stream URL expires before the song would finish playing, with a safety margin."""
+        if not entry.resolved or entry.is_local or entry.expires_at is None:
+            return False
+        return entry.expires_at < self._finishes_at(guild_id, entry, starts_in) + config.STREAM_URL_EXPIRY_MARGIN
+
+    async def _refresh_stream_url(self, entry, guild_id, starts_in=0, priority=INTERACTIVE, reason="just_in_time"):
+        old_expiry = entry.expires_at
+        await entry.resolve(loop=self.bot.loop, force=True, priority=priority, guild_id=guild_id)
+        self.expiry_stats[reason] += 1
+        # Without the refresh, the old URL would have died before the song finished
+        if old_expiry is not None and old_expiry < self._finishes_at(guild_id, entry, starts_in):
+            self.expiry_stats["saved"] += 1
+
+    async def _create_player(self, data, speed, volume=1.0, position=0, mixed=False):
+        """
+        Creates the audio source for a song. At normal volume the audio is sent to discord as Opus: at normal
+        speed YouTube's Opus stream is copied without decoding, otherwise ffmpeg applies atempo and encodes.
+        Volume and normalization gain change while the track plays, so they need raw PCM: ffmpeg decodes,
+        and DSPAudioSource scales each frame. Sources for the crossfade mixer (`mixed`) are always PCM, and the
+        mixer applies the volume.
+        """
+        player_options = FFMPEG_OPTIONS.copy()
+        if data.is_local:
+            # The reconnect options only exist for HTTP inputs; ffmpeg rejects them for files
+            player_options['before_options'] = ''
+        if position:
+            player_options['before_options'] = f"-ss {position:.2f} {player_options['before_options']}".strip()
+        if speed != 1.0:
+            player_options['options'] += f' -filter:a "{self._atempo_filter(speed)}"'
+        if config.OPUS_PASSTHROUGH and not config.LOUDNESS_NORMALIZATION and not mixed and volume == 1.0:
+            if speed != 1.0:
+                # Filtered audio can't be copied, so ffmpeg encodes it with libopus
+                player = discord.FFmpegOpusAudio(data.url, **player_options)
+            elif data.acodec:
+                # FFmpegOpusAudio copies the stream for codec="opus" and encodes with libopus otherwise
+                player = discord.FFmpegOpusAudio(data.url, codec=data.acodec, **player_options)
+            else:
+                player = await discord.FFmpegOpusAudio.from_probe(data.url, **player_options)
+            self.player_modes["opus"] += 1
+            return player
+        self.player_modes["pcm"] += 1
+        source = discord.FFmpegPCMAudio(data.url, **player_options)
+        if not config.LOUDNESS_NORMALIZATION:
+            return source if mixed else DSPAudioSource(source, volume=volume)
+        video_id = data.id
+        # on_loudness runs inside the voice thread's frame (or on the loop), so it only hands the result over
+        on_loudness = (lambda loudness, peak: loudness_analyzer.record(video_id, loudness, peak)) if video_id else None
+        return DSPAudioSource(source, volume=1.0 if mixed else volume, gain_db=self._track_gain(video_id), on_loudness=on_loudness)
+
+    def _track_gain(self, video_id):
+        """Normalization gain in dB for a track from the loudness store, 0 until it has been measured."""
+        measured = loudness_store.get(video_id) if video_id else None
+        if measured is None:
+            return 0.0
+        return loudness_gain(measured[0], config.LOUDNESS_TARGET, config.LOUDNESS_MAX_GAIN_DB)
+
+    @staticmethod
+    def _atempo_filter(speed):
+        # atempo only accepts factors from 0.5 up, so slower speeds are chained
+        filters = []
+        while speed < 0.5:
+            filters.append("atempo=0.5")
+            speed /= 0.5
+        filters.append(f"atempo={speed}")
+        return ",".join(filters)
+
+    async def _swap_player(self, ctx, position=None):
+        """
+        Replaces the playing source with one created for the current speed and volume, seeking ffmpeg to
+        `position` (the current position in the song by default). The stream URL is reused, so this costs one
+        ffmpeg restart and no extraction unless the URL is about to expire.
+        """
+        guild_id = ctx.guild.id
+        data = self.current_song.get(guild_id)
+        if not data or not ctx.voice_client or not ctx.voice_client.source:
+            return False
+        if position is None:
+            position = self._position(guild_id)
+        if data.expires_within(60):
+            logging.info(f"_swap_player: Stream URL for {data.title} is about to expire, re-resolving.")
+            await data.resolve(loop=self.bot.loop, force=True, guild_id=guild_id)
+        speed = self.playback_speed.get(guild_id, 1.0)
+        mixed = isinstance(ctx.voice_client.source, CrossfadeMixer)
+        new_source = await self._create_player(data, speed, self.current_volume.get(guild_id, 1.0), position=position, mixed=mixed)
+        voice_client = ctx.voice_client
+        if (not voice_client or not voice_client.source or self.current_song.get(guild_id) is not data
+                or isinstance(voice_client.source, CrossfadeMixer) != mixed):
+            new_source.cleanup()
+            return False
+        old_source = voice_client.source
+        if mixed:
+            # The mixer keeps playing and only changes the source it reads the current track from
+            old_source = old_source.replace_current(new_source)
+        else:
+            was_paused = voice_client.is_paused()
+            # Assigning the source swaps it in the running player without firing the after callback
+            voice_client.source = new_source
+            if was_paused:
+                voice_client.pause() # The swap resumes the player
+        old_source.cleanup()
+        self.song_offset[guild_id] = position
+        self.song_start_time[guild_id] = self.paused_at.get(guild_id) or time.time()
+        logging.info(f"Swapped audio source for {data.title} in {ctx.guild.name} at {position:.1f}s ({speed}x)")
+        return True
+
+    def _discard_prefetch(self, guild_id):
+        task = self.prefetch_tasks.pop(guild_id, None)
+        if task and not task.done():
+            task.cancel()
+        prefetched = self.prefetched.pop(guild_id, None)
+        if prefetched:
+            prefetched[1].cleanup()
+        mixer = self._get_mixer(guild_id)
+        queued = mixer.clear_next() if mixer else None
+        if queued:
+            queued.cleanup()
+
+    def _get_mixer(self, guild_id):
+        guild = self.bot.get_guild(guild_id)
+        source = guild.voice_client.source if guild and guild.voice_client else None
+        return source if isinstance(source, CrossfadeMixer) else None
+
+    def _crossfade_seconds(self, guild_id):
+        """The guild's crossfade length, 0 for gapless playback, or None if tracks don't go through the mixer."""
+        return self.crossfade.get(guild_id, config.CROSSFADE_SECONDS)
+
+    def _predownload_ahead(self, guild_id):
+        """Queues background downloads into the audio cache for the next few songs, nearest first."""
+        queue = self.song_queues.get(guild_id)
+        upcoming = queue.slice(0, config.PREDOWNLOAD_AHEAD) if queue is not None else []
+        wanted = {}
+        for position, entry in enumerate(upcoming):
+            video_id = entry.id
+            if video_id and not entry.is_local and entry.webpage_url and video_id not in wanted:
+                wanted[video_id] = (entry.webpage_url, position)
+        # Songs that were removed or pushed back no longer need downloading for this guild
+        predownloader.cancel_guild(guild_id, keep=wanted)
+        for video_id, (url, position) in wanted.items():
+            if not audio_cache.contains(video_id):
+                predownloader.submit(video_id, url, position, guild_id)
+        if config.LOUDNESS_NORMALIZATION:
+            self._analyze_ahead(upcoming)
+
+    def _analyze_ahead(self, upcoming):
+        """Queues loudness analysis for upcoming tracks that were downloaded before they were analyzed."""
+        for entry in upcoming:
+            if not entry.id:
+                continue
+            if entry.is_local:
+                path = entry.url
+            else:
+                cached = audio_cache.lookup(entry.id, count=False) if audio_cache.contains(entry.id) else None
+                path = cached["filepath"] if cached else None
+            if path:
+                loudness_analyzer.submit(entry.id, path)
+
+    def _schedule_prefetch(self, guild_id):
+        """(Re)starts the prefetch stage for whatever is now next in the guild's queue."""
+        self._predownload_ahead(guild_id)
+        self._discard_prefetch(guild_id)
+        guild = self.bot.get_guild(guild_id)
+        if not guild or not guild.voice_client or not (guild.voice_client.is_playing() or guild.voice_client.is_paused()):
+            return
+        self.prefetch_tasks[guild_id] = self.bot.loop.create_task(self._prefetch_next(guild_id))
+
+    def _ensure_prefetch(self, guild_id):
+        """Starts the prefetch stage if nothing is prefetched or pending, e.g. after enqueueing into an empty queue."""
+        self._predownload_ahead(guild_id)
+        task = self.prefetch_tasks.get(guild_id)
+        mixer = self._get_mixer(guild_id)
+        if guild_id not in self.prefetched and not (mixer and mixer.next_track) and (task is None or task.done()):
+            self._schedule_prefetch(guild_id)
+
+    def _peek_next(self, guild_id):
+        queue = self.song_queues.get(guild_id)
+        if queue is not None and not queue.empty():
+            return queue.peek()
+        # A looping song with an empty queue is re-queued as the next track when it ends
+        if self.looping.get(guild_id):
+            return self.current_song.get(guild_id)
+        return None
+
+    def _seconds_until_track_end(self, guild_id):
+        data = self.current_song.get(guild_id)
+        if not data or not data.duration or guild_id not in self.song_start_time:
+            return None
+        speed = self.playback_speed.get(guild_id, 1.0)
+        return max(0.0, (data.duration - self._position(guild_id)) / speed)
+
+    async def _prefetch_next(self, guild_id):
+        """
+        Gets the next track ready while the current one plays: its stream URL is re-resolved if it
+        is a placeholder or about to expire, and its ffmpeg process (and HTTP connection) is started
+        shortly before the current track ends so play_next only has to hand it to the voice client.
+        With the crossfade mixer playing, the source is queued in the mixer instead, early enough for the
+        mixer to read the whole fade ahead.
+        """
+        try:
+            entry = self._peek_next(guild_id)
+            if entry is None:
+                return
+            if not entry.use_local_copy():
+                await entry.resolve(loop=self.bot.loop, priority=PREFETCH, guild_id=guild_id)
+
+            fade = self._crossfade_seconds(guild_id)
+            lead = config.PREFETCH_LEAD_SECONDS + (fade or 0)
+            remaining = self._seconds_until_track_end(guild_id)
+            while remaining is not None and remaining > lead:
+                await asyncio.sleep(min(remaining - lead, 30))
+                remaining = self._seconds_until_track_end(guild_id)
+
+            if self._peek_next(guild_id) is not entry:
+                return
+            # The background download may have finished while waiting
+            entry.use_local_copy()
+            starts_in = self._seconds_until_track_end(guild_id) or 0
+            if self._needs_refresh(guild_id, entry, starts_in):
+                logging.info(f"_prefetch_next: Stream URL for {entry.title} is about to expire, re-resolving.")
+                await self._refresh_stream_url(entry, guild_id, starts_in, priority=PREFETCH, reason="prefetch")
+
+            speed = self.playback_speed.get(guild_id, 1.0)
+            volume = self.current_volume.get(guild_id, 1.0)
+            mixed = fade is not None
+            player = await self._create_player(entry, speed, volume, mixed=mixed)
+            mixer = self._get_mixer(guild_id) if mixed else None
+            if mixer is not None:
+                mixer.queue_next(player, entry)
+                logging.info(f"_prefetch_next: Queued {entry.title} in the crossfade mixer for guild {guild_id}")
+            else:
+                self.prefetched[guild_id] = (entry, player, (speed, volume, mixed))
+                logging.info(f"_prefetch_next: Warmed ffmpeg for {entry.title} in guild {guild_id}")
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logging.warning(f"_prefetch_next: Prefetch failed for guild {guild_id}: {e}")
+
+    def _take_prefetched(self, guild_id, data, speed, volume, mixed):
+        prefetched = self.prefetched.pop(guild_id, None)
+        if prefetched is None:
+            return None
+        entry, player, settings = prefetched
+        if entry is data and settings == (speed, volume, mixed):
+            return player
+        player.cleanup()
+        return None
+
+    def _on_track_end(self, ctx, error):
+        # Runs on the voice player thread
+        self.track_ended_at[ctx.guild.id] = time.perf_counter()
+        asyncio.run_coroutine_threadsafe(self._after_playback(ctx, error), self.bot.loop)
+
+    def _on_mixer_advance(self, ctx, data):
+        # Runs on the voice player thread, in the frame the mixer starts the next track
+        asyncio.run_coroutine_threadsafe(self._mixer_advanced(ctx, data), self.bot.loop)
+
+    async def _mixer_advanced(self, ctx, data):
+        """Moves the queue on to the track the crossfade mixer has started, as _after_playback and play_next would."""
+        guild_id = ctx.guild.id
+        queue = await self.get_queue(guild_id)
+        previous = self.current_song.get(guild_id)
+        if self.looping.get(guild_id) and previous:
+            queue.append(previous)
+        if not queue.empty() and queue.peek() is data:
+            queue.popleft()
+        # The mixer switched tracks within one frame
+        self._record_transition(ctx.guild, True, gap_ms=0.0)
+        await self._track_started(ctx, data)
+
+    def _record_transition(self, guild, prefetched, gap_ms=None):
+        ended_at = self.track_ended_at.pop(guild.id, None)
+        if gap_ms is None:
+            if ended_at is None:
+                return
+            gap_ms = (time.perf_counter() - ended_at) * 1000
+        stats = self.transition_stats
+        stats["count"] += 1
+        stats["prefetched"] += int(prefetched)
+        stats["total_gap_ms"] += gap_ms
+        stats["max_gap_ms"] = max(stats["max_gap_ms"], gap_ms)
+        logging.info(f"Track transition gap in {guild.name}: {gap_ms:.1f} ms (prefetched: {prefetched})")
+
     async def play_next(self, ctx):
         logging.info("play_next called.")
         queue = await self.get_queue(ctx.guild.id)
-        if not queue.empty() and ctx.voice_client:
-            data = await queue.get()
-            
+        data = await self._next_playable(ctx, queue) if ctx.voice_client else None
+        if data is not None and ctx.voice_client:
             try:
                 logging.info(f"Attempting to play {data.title}")
                 
-                # Get current playback speed
+                # Get current playback speed and volume
                 current_speed = self.playback_speed.get(ctx.guild.id, 1.0)
-                
-                # Dynamically create FFMPEG options with atempo filter if speed is not 1.0
-                player_options = FFMPEG_OPTIONS.copy()
-                if current_speed != 1.0:
-                    player_options['options'] += f' -filter:a "atempo={current_speed}"'
-
-                player = discord.FFmpegPCMAudio(data.url, **player_options)
-                source = discord.PCMVolumeTransformer(player, volume=self.current_volume.get(ctx.guild.id, 1.0))
-                ctx.voice_client.play(source, after=lambda e: self.bot.loop.create_task(self._after_playback(ctx, e)))
-                self.current_song[ctx.guild.id] = data
-                self.song_start_time[ctx.guild.id] = time.time()
-                await self.bot.change_presence(activity=discord.Activity(type=discord.ActivityType.listening, name=data.title))
-                logging.info(f"Playing {data.title} in {ctx.guild.name}")
-                # Cancel any existing nowplaying update task for this guild
-                if ctx.guild.id in self.nowplaying_tasks and self.nowplaying_tasks[ctx.guild.id] and not self.nowplaying_tasks[ctx.guild.id].done():
-                    self.nowplaying_tasks[ctx.guild.id].cancel()
-                # Start a new task to update the nowplaying message periodically
-                self.nowplaying_tasks[ctx.guild.id] = self.bot.loop.create_task(self._update_nowplaying_message(ctx.guild.id, ctx.channel.id))
+                current_volume = self.current_volume.get(ctx.guild.id, 1.0)
+
+                fade = self._crossfade_seconds(ctx.guild.id)
+                mixed = fade is not None
+
+                source = self._take_prefetched(ctx.guild.id, data, current_speed, current_volume, mixed)
+                prefetched = source is not None
+                if source is None:
+                    if not data.use_local_copy() and self._needs_refresh(ctx.guild.id, data):
+                        logging.info(f"Stream URL for {data.title} expires before it would finish, re-resolving.")
+                        await self._refresh_stream_url(data, ctx.guild.id)
+                    source = await self._create_player(data, current_speed, current_volume, mixed=mixed)
+                if mixed:
+                    # The following tracks are queued into this mixer and start without a new player
+                    source = CrossfadeMixer(source, data, fade_seconds=fade, volume=current_volume,
+                                            on_advance=lambda track: self._on_mixer_advance(ctx, track))
+                ctx.voice_client.play(source, after=lambda e: self._on_track_end(ctx, e))
+                self._record_transition(ctx.guild, prefetched)
+                await self._track_started(ctx, data)
             except Exception as e:
                 logging.error(f"Error playing next song: {e}")
                 await ctx.send(embed=self.create_embed("Error", f"Could not play the next song: {e}", discord.Color.red()))
@@ -253,114 +699,137 @@ class Music(commands.Cog):
             await self.bot.change_presence(activity=None)
             self._start_inactivity_timer(ctx.guild.id)
 
-    async def _update_nowplaying_message(self, guild_id, channel_id):
-        logging.info(f"_update_nowplaying_message: Starting task for guild {guild_id}")
-        while True:
-            try:
-                guild = self.bot.get_guild(guild_id)
-                if not guild or not guild.voice_client:
-                    logging.warning(f"_update_nowplaying_message: Bot not in a voice channel for guild {guild_id}. Cancelling task.")
-                    break
-
-                channel = self.bot.get_channel(channel_id)
-                if not channel:
-                    logging.warning(f"_update_nowplaying_message: Channel ({channel_id}) not found. Cancelling task.")
-                    break
-                
-                await self._update_nowplaying_display(guild_id, channel.id, silent_update=True)
-                logging.debug(f"_update_nowplaying_message: Message updated for guild {guild_id}. Stored Message ID: {self.nowplaying_message.get(guild_id).id if self.nowplaying_message.get(guild_id) else 'None'}")
-                await asyncio.sleep(25)  # Update every 25 seconds
-            except asyncio.CancelledError:
-                logging.info(f"_update_nowplaying_message: Task cancelled for {guild_id}")
-                break
-            except Exception as e:
-                logging.error(f"_update_nowplaying_message: Error updating message for guild {guild_id}: {e}", exc_info=True)
-                await asyncio.sleep(5) # Wait before retrying
+    async def _track_started(self, ctx, data):
+        guild_id = ctx.guild.id
+        self.current_song[guild_id] = data
+        self.song_start_time[guild_id] = time.time()
+        self.song_offset[guild_id] = 0
+        self.paused_at.pop(guild_id, None)
+        self._schedule_prefetch(guild_id)
+        await self.bot.change_presence(activity=discord.Activity(type=discord.ActivityType.listening, name=data.title))
+        logging.info(f"Playing {data.title} in {ctx.guild.name}")
+        self.bot.loop.create_task(self._resolve_ahead(guild_id))
+        # Show the new song right away, then keep the nowplaying message updated periodically
+        self.nowplaying_scheduler.track(guild_id, ctx.channel.id, delay=0)
+
+    def _elapsed(self, guild_id):
+        """Seconds of the current song played so far, not counting time spent paused."""
+        start = self.song_start_time.get(guild_id)
+        if start is None:
+            return 0
+        return (self.paused_at.get(guild_id) or time.time()) - start
+
+    def _position(self, guild_id):
+        """Position in the current song in seconds of audio, accounting for the playback speed."""
+        return self.song_offset.get(guild_id, 0) + self._elapsed(guild_id) * self.playback_speed.get(guild_id, 1.0)
+
+    def _get_nowplaying_view(self):
+        # The buttons never change, so one view is shared by every nowplaying message
+        if self.nowplaying_view is None:
+            view = discord.ui.View(timeout=None)
+            view.add_item(discord.ui.Button(emoji=config.PLAY_EMOJI, style=discord.ButtonStyle.secondary, custom_id="play"))
+            view.add_item(discord.ui.Button(emoji=config.PAUSE_EMOJI, style=discord.ButtonStyle.secondary, custom_id="pause"))
+            view.add_item(discord.ui.Button(emoji=config.SKIP_EMOJI, style=discord.ButtonStyle.secondary, custom_id="skip"))
+            view.add_item(discord.ui.Button(emoji=config.ERROR_EMOJI, style=discord.ButtonStyle.danger, custom_id="stop"))
+            view.add_item(discord.ui.Button(emoji=config.QUEUE_EMOJI, style=discord.ButtonStyle.primary, custom_id="queue"))
+            self.nowplaying_view = view
+        return self.nowplaying_view
+
+    async def _build_nowplaying_embed(self, guild_id):
+        data = self.current_song[guild_id]
+        queue = await self.get_queue(guild_id)
+        current_time = int(self._position(guild_id))
+        progress_bar = self._get_progress_bar(current_time, data.duration or 0)
+        embed = self.create_embed(f"{config.PLAY_EMOJI} Now Playing",
+                                  f"[{data.title}]({data.webpage_url})\n\n{progress_bar} {self._format_duration(current_time)} / {self._format_duration(data.duration)}",
+                                  Queue=f"{len(queue)} songs remaining ({self._format_duration(queue.total_duration)})")
+        embed.set_thumbnail(url=data.thumbnail)
+        return embed
+
+    async def _refresh_nowplaying(self, guild_id, channel_id):
+        """Called by the nowplaying scheduler for each tracked guild."""
+        guild = self.bot.get_guild(guild_id)
+        if not guild or not guild.voice_client:
+            logging.warning(f"_refresh_nowplaying: Bot not in a voice channel for guild {guild_id}. Stopping updates.")
+            return "stopped"
+        if not self.bot.get_channel(channel_id):
+            logging.warning(f"_refresh_nowplaying: Channel ({channel_id}) not found. Stopping updates.")
+            return "stopped"
+        return await self._update_nowplaying_display(guild_id, channel_id, silent_update=True)
 
     async def _update_nowplaying_display(self, guild_id, channel_id, silent_update=False):
+        """
+        Brings the stored nowplaying message up to date and returns "edited", "sent", "deleted" or "skipped".
+        The stored message is edited directly instead of being fetched first, and edits that would
+        not change the embed are skipped.
+        """
         logging.debug(f"_update_nowplaying_display: Called for guild {guild_id}, channel {channel_id}. Silent: {silent_update}.")
         guild = self.bot.get_guild(guild_id)
         channel = self.bot.get_channel(channel_id)
 
         if not guild or not channel:
             logging.warning(f"nowplaying_display: Guild ({guild_id}) or channel ({channel_id}) not found. Aborting update.")
-            return
+            return "skipped"
 
         current_nowplaying_message = self.nowplaying_message.get(guild_id)
         logging.debug(f"_update_nowplaying_display: Stored message object: {current_nowplaying_message.id if current_nowplaying_message else 'None'}")
 
         if guild_id in self.current_song and self.current_song[guild_id]:
             data = self.current_song[guild_id]
-            queue = await self.get_queue(guild_id) # Pass guild_id directly
-            
-            current_time = int(time.time() - self.song_start_time[guild_id])
-            progress_bar = self._get_progress_bar(current_time, data.duration)
-            
-            embed = self.create_embed(f"{config.PLAY_EMOJI} Now Playing", 
-                                      f"[{data.title}]({data.webpage_url})\n\n{progress_bar} {current_time // 60}:{current_time % 60:02d} / {data.duration // 60}:{data.duration % 60:02d}",
-                                      Queue=f"{queue.qsize()} songs remaining")
-            embed.set_thumbnail(url=data.thumbnail)
-            
-            view = discord.ui.View(timeout=None)
-            view.add_item(discord.ui.Button(emoji=config.PLAY_EMOJI, style=discord.ButtonStyle.secondary, custom_id="play"))
-            view.add_item(discord.ui.Button(emoji=config.PAUSE_EMOJI, style=discord.ButtonStyle.secondary, custom_id="pause"))
-            view.add_item(discord.ui.Button(emoji=config.SKIP_EMOJI, style=discord.ButtonStyle.secondary, custom_id="skip"))
-            view.add_item(discord.ui.Button(emoji=config.ERROR_EMOJI, style=discord.ButtonStyle.danger, custom_id="stop"))
-            view.add_item(discord.ui.Button(emoji=config.QUEUE_EMOJI, style=discord.ButtonStyle.primary, custom_id="queue"))
+            embed = await self._build_nowplaying_embed(guild_id)
+            rendered = embed.to_dict()
+
+            if current_nowplaying_message and self.nowplaying_rendered.get(guild_id) == rendered:
+                logging.debug(f"nowplaying_display: Embed unchanged for {guild.name}. Skipping edit.")
+                return "skipped"
 
+            status = "sent"
             if current_nowplaying_message:
                 try:
-                    # Attempt to fetch the message to ensure it still exists and is valid
-                    fetched_message = await channel.fetch_message(current_nowplaying_message.id)
-                    logging.debug(f"nowplaying_display: Fetched message {fetched_message.id} for editing.")
-                    await fetched_message.edit(embed=embed, view=view)
-                    self.nowplaying_message[guild_id] = fetched_message # Update reference in case it changed
-                    logging.info(f"nowplaying_display: Edited message {fetched_message.id} for {data.title} in {guild.name}")
+                    # Omitting view= leaves the message's buttons untouched
+                    self.nowplaying_message[guild_id] = await current_nowplaying_message.edit(embed=embed)
+                    status = "edited"
+                    logging.info(f"nowplaying_display: Edited message {current_nowplaying_message.id} for {data.title} in {guild.name}")
                 except discord.NotFound:
                     logging.warning(f"nowplaying_display: Previous message {current_nowplaying_message.id} not found for editing in {guild.name}. Sending new message.")
-                    self.nowplaying_message[guild_id] = await channel.send(embed=embed, view=view)
+                    self.nowplaying_message[guild_id] = await channel.send(embed=embed, view=self._get_nowplaying_view())
                     logging.info(f"nowplaying_display: Sent new message {self.nowplaying_message[guild_id].id} for {data.title} in {guild.name}")
                 except Exception as e:
                     logging.error(f"nowplaying_display: Error editing message {current_nowplaying_message.id} for {data.title} in {guild.name}: {e}", exc_info=True)
                     # If editing fails for other reasons, try sending a new message
-                    self.nowplaying_message[guild_id] = await channel.send(embed=embed, view=view)
+                    self.nowplaying_message[guild_id] = await channel.send(embed=embed, view=self._get_nowplaying_view())
                     logging.info(f"nowplaying_display: Sent new message {self.nowplaying_message[guild_id].id} after edit failure for {data.title} in {guild.name}")
             else:
-                self.nowplaying_message[guild_id] = await channel.send(embed=embed, view=view)
+                self.nowplaying_message[guild_id] = await channel.send(embed=embed, view=self._get_nowplaying_view())
                 logging.info(f"nowplaying_display: Sent initial message {self.nowplaying_message[guild_id].id} for {data.title} in {guild.name}")
+            self.nowplaying_rendered[guild_id] = rendered
+            return status
         else: # Nothing is playing
             logging.debug(f"nowplaying_display: Nothing playing for guild {guild_id}. Stored message: {current_nowplaying_message.id if current_nowplaying_message else 'None'}")
+            is_not_playing_message = bool(current_nowplaying_message and current_nowplaying_message.embeds and current_nowplaying_message.embeds[0].title == "Not Playing")
+            if silent_update and (not current_nowplaying_message or is_not_playing_message):
+                # Nothing to clean up, and silent updates never send a "Not Playing" message
+                logging.debug(f"nowplaying_display: Silent update with nothing to change for {guild.name}. Skipping.")
+                return "skipped"
+
+            status = "skipped"
             if current_nowplaying_message:
                 try:
-                    # Attempt to fetch before deleting to avoid NotFound error if already gone
-                    fetched_message = await channel.fetch_message(current_nowplaying_message.id)
-                    logging.debug(f"nowplaying_display: Fetched message {fetched_message.id} for deletion.")
-                    await fetched_message.delete()
-                    del self.nowplaying_message[guild_id]
+                    await current_nowplaying_message.delete()
+                    status = "deleted"
                     logging.info(f"nowplaying_display: Deleted previous message {current_nowplaying_message.id} as nothing is playing in {guild.name}")
                 except discord.NotFound:
                     logging.warning(f"nowplaying_display: Previous message {current_nowplaying_message.id} not found for deletion in {guild.name}. Already gone?")
-                    pass # Message already deleted
                 except Exception as e:
                     logging.error(f"nowplaying_display: Error deleting message {current_nowplaying_message.id} in {guild.name}: {e}", exc_info=True)
-            
-            # Only send "Not Playing" if not a silent update and no message is currently displayed
-            if not silent_update and not current_nowplaying_message:
+                self.nowplaying_message.pop(guild_id, None)
+                self.nowplaying_rendered.pop(guild_id, None)
+
+            if not silent_update:
                 self.nowplaying_message[guild_id] = await channel.send(embed=self.create_embed("Not Playing", "The bot is not currently playing anything."))
                 logging.info(f"nowplaying_display: Nothing playing in {guild.name}. Sent 'Not Playing' message.")
-            elif silent_update and current_nowplaying_message and current_nowplaying_message.embeds and current_nowplaying_message.embeds[0].title == "Not Playing":
-                # If it's a silent update and the current message is "Not Playing", do nothing to avoid spam
-                logging.debug(f"nowplaying_display: Silent update, and 'Not Playing' message already present for {guild.name}. Skipping.")
-                pass
-            elif silent_update and not current_nowplaying_message:
-                # If it's a silent update and no message is present, do nothing. A new message will be sent when a song starts.
-                logging.debug(f"nowplaying_display: Silent update, no message present for {guild.name}. Skipping sending 'Not Playing'.")
-                pass
-            else:
-                # If it's not a silent update, or if there's an old song message, send a new "Not Playing" message
-                if not silent_update:
-                    self.nowplaying_message[guild_id] = await channel.send(embed=self.create_embed("Not Playing", "The bot is not currently playing anything."))
-                    logging.info(f"nowplaying_display: Nothing playing in {guild.name}. Sent 'Not Playing' message (non-silent or old message).")
+                status = "sent"
+            return status
 
     async def _after_playback(self, ctx, error):
         if error:
@@ -374,17 +843,15 @@ class Music(commands.Cog):
             # If looping, re-add the current song to the queue
             current_song_data = self.current_song.get(ctx.guild.id)
             if current_song_data:
-                await queue.put(current_song_data)
+                queue.append(current_song_data)
                 logging.info(f"Looping enabled. Re-added {current_song_data.title} to queue.")
         
         # Play the next song in the queue
         await self.play_next(ctx)
 
-        # If queue is empty and not looping, cancel the nowplaying update task
+        # If queue is empty and not looping, stop the nowplaying updates
         if queue.empty() and not self.looping.get(ctx.guild.id):
-            if ctx.guild.id in self.nowplaying_tasks and self.nowplaying_tasks[ctx.guild.id] and not self.nowplaying_tasks[ctx.guild.id].done():
-                self.nowplaying_tasks[ctx.guild.id].cancel()
-                del self.nowplaying_tasks[ctx.guild.id]
+            self.nowplaying_scheduler.untrack(ctx.guild.id)
 
     @commands.command(name="volume")
     async def volume(self, ctx, volume: int):
@@ -396,9 +863,15 @@ class Music(commands.Cog):
 
         if 0 <= volume <= 200:
             new_volume_float = volume / 100
-            ctx.voice_client.source.volume = new_volume_float
             self.current_volume[guild_id] = new_volume_float # Store the volume
-            logging.info(f"Volume set to {volume}% in {ctx.guild.name}. Actual source volume: {ctx.voice_client.source.volume}")
+            if isinstance(ctx.voice_client.source, (DSPAudioSource, CrossfadeMixer)):
+                ctx.voice_client.source.volume = new_volume_float
+            elif new_volume_float != 1.0:
+                # Opus passthrough can't scale volume, so switch this song to the PCM path
+                await self._swap_player(ctx)
+            # A prefetched player was created for the old volume
+            self._schedule_prefetch(guild_id)
+            logging.info(f"Volume set to {volume}% in {ctx.guild.name}.")
             await ctx.send(embed=self.create_embed("Volume Control", f"{config.SUCCESS_EMOJI} Volume set to {volume}%"))
         else:
             logging.warning(f"Invalid volume {volume} provided by {ctx.author} in {ctx.guild.name}")
@@ -425,44 +898,27 @@ class Music(commands.Cog):
             # Send a new message and store it
             if guild_id in self.current_song and self.current_song[guild_id]:
                 data = self.current_song[guild_id]
-                queue = await self.get_queue(ctx.guild.id)
-                current_time = int(time.time() - self.song_start_time[guild_id])
-                progress_bar = self._get_progress_bar(current_time, data.duration)
-                embed = self.create_embed(f"{config.PLAY_EMOJI} Now Playing", 
-                                          f"[{data.title}]({data.webpage_url})\n\n{progress_bar} {current_time // 60}:{current_time % 60:02d} / {data.duration // 60}:{data.duration % 60:02d}",
-                                          Queue=f"{queue.qsize()} songs remaining")
-                embed.set_thumbnail(url=data.thumbnail)
-                view = discord.ui.View(timeout=None)
-                view.add_item(discord.ui.Button(emoji=config.PLAY_EMOJI, style=discord.ButtonStyle.secondary, custom_id="play"))
-                view.add_item(discord.ui.Button(emoji=config.PAUSE_EMOJI, style=discord.ButtonStyle.secondary, custom_id="pause"))
-                view.add_item(discord.ui.Button(emoji=config.SKIP_EMOJI, style=discord.ButtonStyle.secondary, custom_id="skip"))
-                view.add_item(discord.ui.Button(emoji=config.ERROR_EMOJI, style=discord.ButtonStyle.danger, custom_id="stop"))
-                view.add_item(discord.ui.Button(emoji=config.QUEUE_EMOJI, style=discord.ButtonStyle.primary, custom_id="queue"))
-                
-                self.nowplaying_message[guild_id] = await ctx.send(embed=embed, view=view)
+                embed = await self._build_nowplaying_embed(guild_id)
+                self.nowplaying_message[guild_id] = await ctx.send(embed=embed, view=self._get_nowplaying_view())
+                self.nowplaying_rendered[guild_id] = embed.to_dict()
                 logging.info(f"nowplaying: Sent initial message {self.nowplaying_message[guild_id].id} for {data.title} in {ctx.guild.name}")
 
-                # Cancel any existing nowplaying update task for this guild
-                if guild_id in self.nowplaying_tasks and self.nowplaying_tasks[guild_id] and not self.nowplaying_tasks[guild_id].done():
-                    self.nowplaying_tasks[guild_id].cancel()
-                # Start a new task to update the nowplaying message periodically
-                self.nowplaying_tasks[guild_id] = self.bot.loop.create_task(self._update_nowplaying_message(guild_id, ctx.channel.id))
+                # Keep the new message updated periodically
+                self.nowplaying_scheduler.track(guild_id, ctx.channel.id)
             else:
                 self.nowplaying_message[guild_id] = await ctx.send(embed=self.create_embed("Not Playing", "The bot is not currently playing anything."))
                 logging.info(f"nowplaying: Sent initial 'Not Playing' message for {ctx.guild.name}")
         
-        # The background task will call _update_nowplaying_display silently
+        # The nowplaying scheduler will call _update_nowplaying_display silently
         # This command itself doesn't need to call it if it just sent a new message
-        # If it was a silent call (from the background task), then _update_nowplaying_display is already called by the task loop
 
     @commands.command(name="queue")
-    async def queue_info(self, ctx):
+    async def queue_info(self, ctx, page: int = 1):
         logging.info(f"Queue command invoked by {ctx.author} in {ctx.guild.name})")
         queue = await self.get_queue(ctx.guild.id) # Ensure get_queue is called with guild_id
         if not queue.empty():
-            queue_list = "\n".join(f"**{i+1}.** {item.title}" for i, item in enumerate(list(queue._queue)))
-            logging.info(f"Displaying queue with {queue.qsize()} songs for {ctx.guild.name})")
-            await ctx.send(embed=self.create_embed(f"{config.QUEUE_EMOJI} Current Queue", queue_list))
+            logging.info(f"Displaying queue page {page} with {len(queue)} songs for {ctx.guild.name})")
+            await ctx.send(embed=self._queue_page_embed(queue, page))
         else:
             logging.info(f"Queue is empty for {ctx.guild.name})")
             await ctx.send(embed=self.create_embed("Empty Queue", "The queue is currently empty."))
@@ -483,17 +939,16 @@ class Music(commands.Cog):
         logging.info(f"Stop command invoked by {ctx.author} in {ctx.guild.name}")
         queue = await self.get_queue(ctx.guild.id)
         if not queue.empty():
-            while not queue.empty():
-                await queue.get()
+            queue.clear()
             logging.info(f"Queue cleared in {ctx.guild.name}")
+        self._discard_prefetch(ctx.guild.id)
+        predownloader.cancel_guild(ctx.guild.id)
         if ctx.voice_client:
             ctx.voice_client.stop()
             logging.info(f"Voice client stopped in {ctx.guild.name}")
         
-        # Cancel nowplaying update task
-        if ctx.guild.id in self.nowplaying_tasks and self.nowplaying_tasks[ctx.guild.id] and not self.nowplaying_tasks[ctx.guild.id].done():
-            self.nowplaying_tasks[ctx.guild.id].cancel()
-            del self.nowplaying_tasks[ctx.guild.id]
+        # Stop nowplaying updates
+        self.nowplaying_scheduler.untrack(ctx.guild.id)
 
         await self.bot.change_presence(activity=None)
         await ctx.send(embed=self.create_embed("Playback Stopped", f"{config.SUCCESS_EMOJI} Music has been stopped and the queue has been cleared."))
@@ -503,6 +958,7 @@ class Music(commands.Cog):
         logging.info(f"Pause command invoked by {ctx.author} in {ctx.guild.name}")
         if ctx.voice_client and ctx.voice_client.is_playing():
             ctx.voice_client.pause()
+            self.paused_at[ctx.guild.id] = time.time()
             logging.info(f"Music paused in {ctx.guild.name}")
             await ctx.send(embed=self.create_embed("Playback Paused", f"{config.PAUSE_EMOJI} The music has been paused."))
         else:
@@ -514,6 +970,10 @@ class Music(commands.Cog):
         logging.info(f"Resume command invoked by {ctx.author} in {ctx.guild.name}")
         if ctx.voice_client and ctx.voice_client.is_paused():
             ctx.voice_client.resume()
+            paused_at = self.paused_at.pop(ctx.guild.id, None)
+            if paused_at and ctx.guild.id in self.song_start_time:
+                # Shift the start time so progress does not count the pause
+                self.song_start_time[ctx.guild.id] += time.time() - paused_at
             logging.info(f"Music resumed in {ctx.guild.name}")
             await ctx.send(embed=self.create_embed("Playback Resumed", f"{config.PLAY_EMOJI} The music has been resumed."))
         else:
@@ -525,9 +985,10 @@ class Music(commands.Cog):
         logging.info(f"Clear command invoked by {ctx.author} in {ctx.guild.name}")
         queue = await self.get_queue(ctx.guild.id)
         if not queue.empty():
-            while not queue.empty():
-                await queue.get()
+            queue.clear()
             logging.info(f"Queue cleared by {ctx.author} in {ctx.guild.name}")
+            self._discard_prefetch(ctx.guild.id)
+            predownloader.cancel_guild(ctx.guild.id)
             await ctx.send(embed=self.create_embed("Queue Cleared", f"{config.SUCCESS_EMOJI} The queue has been cleared."))
         else:
             logging.info(f"Clear command invoked but queue already empty in {ctx.guild.name}")
@@ -539,17 +1000,10 @@ class Music(commands.Cog):
     async def remove(self, ctx, number: int):
         logging.info(f"Remove command invoked by {ctx.author} in {ctx.guild.name} to remove song number {number}")
         queue = await self.get_queue(ctx.guild.id)
-        if number > 0 and number <= queue.qsize():
-            removed_song = None
-            temp_queue = asyncio.Queue()
-            for i in range(queue.qsize()):
-                song = await queue.get()
-                if i + 1 == number:
-                    removed_song = song
-                else:
-                    await temp_queue.put(song)
-            
-            self.song_queues[ctx.guild.id] = temp_queue
+        if number > 0 and number <= len(queue):
+            removed_song = queue.remove_at(number - 1)
+            if number == 1:
+                self._schedule_prefetch(ctx.guild.id)
             
             if removed_song:
                 logging.info(f"Removed song '{removed_song.title}' (number {number}) from queue in {ctx.guild.name}")
@@ -570,6 +1024,51 @@ class Music(commands.Cog):
         logging.info(f"Looping {status} for {ctx.guild.name}")
         await ctx.send(embed=self.create_embed("Loop Toggled", f"{config.SUCCESS_EMOJI} Looping is now **{status}**."))
 
+    @commands.command(name="crossfade")
+    async def crossfade_command(self, ctx, seconds: str = None):
+        logging.info(f"Crossfade command invoked by {ctx.author} in {ctx.guild.name} with: {seconds}")
+        guild_id = ctx.guild.id
+        if seconds is None:
+            fade = self._crossfade_seconds(guild_id)
+            if fade is None:
+                status = "Crossfade is **off**."
+            elif fade == 0:
+                status = "Tracks play back to back with no gap."
+            else:
+                status = f"Tracks crossfade over **{fade:g}s**."
+            stats = CrossfadeMixer.stats
+            if stats["frames"]:
+                status += f"\nMixer CPU time: avg {stats['total_ms'] / stats['frames']:.3f} ms/frame, max {stats['max_ms']:.2f} ms (of 20 ms)"
+            await ctx.send(embed=self.create_embed("Crossfade", status))
+            return
+
+        if seconds.lower() == "off":
+            fade = None
+        else:
+            try:
+                fade = float(seconds)
+            except ValueError:
+                fade = -1
+            if not 0 <= fade <= config.CROSSFADE_MAX_SECONDS:
+                await ctx.send(embed=self.create_embed("Error", f"{config.ERROR_EMOJI} Crossfade must be `off` or between 0 and {config.CROSSFADE_MAX_SECONDS:g} seconds.", discord.Color.red()))
+                return
+        self.crossfade[guild_id] = fade
+        mixer = self._get_mixer(guild_id)
+        if mixer and fade is not None:
+            mixer.set_fade(fade)
+        # The next track's player depends on whether it goes through the mixer
+        self._schedule_prefetch(guild_id)
+        if fade is None:
+            message = "Crossfade disabled."
+        elif fade == 0:
+            message = "Tracks will play back to back with no gap."
+        else:
+            message = f"Tracks will crossfade over **{fade:g}s**."
+        if ctx.voice_client and ctx.voice_client.source and (mixer is None) != (fade is None):
+            message += " This takes effect from the next song."
+        logging.info(f"Crossfade set to {fade} in {ctx.guild.name}")
+        await ctx.send(embed=self.create_embed("Crossfade", f"{config.SUCCESS_EMOJI} {message}"))
+
     def _get_current_speed_index(self, guild_id):
         current_speed = self.playback_speed.get(guild_id, 1.0)
         try:
@@ -583,28 +1082,19 @@ class Music(commands.Cog):
             await ctx.send(embed=self.create_embed("Error", f"{config.ERROR_EMOJI} No song is currently playing to change speed.", discord.Color.red()))
             return
 
+        # The position has to be taken at the old speed
+        position = self._position(guild_id)
         self.playback_speed[guild_id] = new_speed
         logging.info(f"Setting playback speed to {new_speed} for {ctx.guild.name}")
 
-        # Re-create the player with the new speed
+        # Re-create the player with the new speed, continuing from the same position
         current_song_data = self.current_song.get(guild_id)
         if current_song_data:
-            # Stop current playback
-            ctx.voice_client.stop()
-
-            # Dynamically create FFMPEG options with atempo filter
-            player_options = FFMPEG_OPTIONS.copy()
-            if new_speed != 1.0:
-                player_options['options'] += f' -filter:a "atempo={new_speed}"'
-
-            # Create and play the new player with the updated speed
-            player = discord.FFmpegPCMAudio(current_song_data.url, **player_options)
-            source = discord.PCMVolumeTransformer(player, volume=self.current_volume.get(guild_id, 1.0))
-            ctx.voice_client.play(source, after=lambda e: self.bot.loop.create_task(self._after_playback(ctx, e)))
-            
-            self.song_start_time[guild_id] = time.time() # Reset start time for accurate progress bar
+            await self._swap_player(ctx, position)
+            # A prefetched player was created for the old speed
+            self._schedule_prefetch(guild_id)
             await ctx.send(embed=self.create_embed("Speed Changed", f"{config.SUCCESS_EMOJI} Playback speed set to **{new_speed}x**."))
-            await self.nowplaying(ctx, silent=True) # Update nowplaying message immediately
+            self.nowplaying_scheduler.track(guild_id, ctx.channel.id, delay=0) # Update nowplaying message immediately
         else:
             await ctx.send(embed=self.create_embed("Error", f"{config.ERROR_EMOJI} Could not apply speed change. No current song data.", discord.Color.red()))
 
@@ -638,18 +1128,8 @@ class Music(commands.Cog):
             await ctx.send(embed=self.create_embed("Empty Queue", f"{config.ERROR_EMOJI} The queue is empty, nothing to shuffle.", discord.Color.orange()))
             return
 
-        # Get all items from the queue
-        queue_list = []
-        while not queue.empty():
-            queue_list.append(await queue.get())
-
-        # Shuffle the list
-        random.shuffle(queue_list)
-
-        # Put items back into the queue
-        for item in queue_list:
-            await queue.put(item)
-        
+        queue.shuffle()
+        self._schedule_prefetch(ctx.guild.id)
         logging.info(f"Queue shuffled for {ctx.guild.name}")
         await ctx.send(embed=self.create_embed("Queue Shuffled", f"{config.SUCCESS_EMOJI} The queue has been shuffled."))
 
@@ -672,8 +1152,7 @@ class Music(commands.Cog):
             elif custom_id == "queue":
                 queue = await self.get_queue(ctx.guild.id)
                 if not queue.empty():
-                    queue_list = "\n".join(f"**{i+1}.** {item.title}" for i, item in enumerate(list(queue._queue)))
-                    embed = self.create_embed(f"{config.QUEUE_EMOJI} Current Queue", queue_list)
+                    embed = self._queue_page_embed(queue, 1)
                     await interaction.response.send_message(embed=embed, ephemeral=True)
                 else:
                     embed = self.create_embed("Empty Queue", "The queue is currently empty.")
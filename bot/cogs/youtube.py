@@ -1,8 +1,26 @@
 import asyncio
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 import yt_dlp
 import discord
 import logging
 
+import config
+from utils.ttl_cache import TTLCache
+from utils.audio_cache import AudioCache, INCOMING_DIR
+from utils.download_pool import DownloadPool
+from utils.extraction_executor import ExtractionExecutor, INTERACTIVE
+from utils.loudness import LoudnessStore, LoudnessAnalyzer
+
+COOKIE_FILE = "youtube_cookie.txt"
+
 FFMPEG_OPTIONS = {
     'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5',
     'options': '-vn'
@@ -27,7 +45,8 @@ YTDL_STREAM_FORMAT_OPTIONS = {
 
 YTDL_DOWNLOAD_FORMAT_OPTIONS = {
     "format": "bestaudio/best",
-    "outtmpl": "audio_cache/%(extractor)s-%(id)s-%(title)s.%(ext)s",
+    # Finished downloads are moved into audio_cache/ and indexed by AudioCache.add
+    "outtmpl": f"{INCOMING_DIR}/%(id)s.%(ext)s",
     "restrictfilenames": True,
     "noplaylist": True,
     "nocheckcertificate": False,
@@ -44,29 +63,473 @@ YTDL_DOWNLOAD_FORMAT_OPTIONS = {
     "extractor_args": {"youtube": {"player_client": ["web"]}},
 }
 
+# Playlists are listed flat: entries come back as lightweight placeholders and each one
+# is resolved to a stream URL just before it plays (see YTDLSource.resolve).
+YTDL_PLAYLIST_FORMAT_OPTIONS = {
+    **YTDL_STREAM_FORMAT_OPTIONS,
+    "noplaylist": False,
+    "extract_flat": "in_playlist",
+}
+
+# Background downloads of queued tracks are rate limited so they don't compete with playing streams
+YTDL_PREDOWNLOAD_FORMAT_OPTIONS = {
+    **YTDL_DOWNLOAD_FORMAT_OPTIONS,
+    "ratelimit": config.PREDOWNLOAD_RATELIMIT or None,
+}
+
+class YTDLPool:
+    """
+    Keeps long-lived YoutubeDL instances per option profile, shared across guilds.
+    Each instance is used by one thread at a time, and the pool is rebuilt when the cookie file changes.
+    """
+    PROFILES = {
+        "stream": YTDL_STREAM_FORMAT_OPTIONS,
+        "download": YTDL_DOWNLOAD_FORMAT_OPTIONS,
+        "playlist": YTDL_PLAYLIST_FORMAT_OPTIONS,
+        "predownload": YTDL_PREDOWNLOAD_FORMAT_OPTIONS,
+    }
+
+    def __init__(self, cookie_file=COOKIE_FILE, max_idle=4):
+        self.cookie_file = cookie_file
+        self.max_idle = max_idle
+        self._idle = {profile: [] for profile in self.PROFILES}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._cookie_mtime = self._get_cookie_mtime()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def _get_cookie_mtime(self):
+        try:
+            return os.stat(self.cookie_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def _build(self, profile):
+        options = dict(self.PROFILES[profile])
+        options["cookiefile"] = self.cookie_file if self._cookie_mtime is not None else None
+        logging.info(f"YTDLPool: Building new YoutubeDL instance for profile '{profile}'")
+        return yt_dlp.YoutubeDL(options)
+
+    def _reset(self):
+        # Instances are dropped rather than closed: YoutubeDL.close() writes the cookie jar
+        # back to disk, which would bump the cookie file's mtime and trigger another refresh.
+        for idle in self._idle.values():
+            idle.clear()
+        self._generation += 1
+        self.refreshes += 1
+
+    def refresh(self):
+        """Discards all pooled instances so the next request picks up new options or cookies."""
+        with self._lock:
+            self._cookie_mtime = self._get_cookie_mtime()
+            self._reset()
+        logging.info("YTDLPool: Pool refreshed.")
+
+    @contextmanager
+    def acquire(self, profile):
+        with self._lock:
+            cookie_mtime = self._get_cookie_mtime()
+            if cookie_mtime != self._cookie_mtime:
+                logging.info(f"YTDLPool: {self.cookie_file} changed, rebuilding extractors.")
+                self._cookie_mtime = cookie_mtime
+                self._reset()
+            idle = self._idle[profile]
+            ydl = idle.pop() if idle else None
+            if ydl is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            generation = self._generation
+
+        if ydl is None:
+            ydl = self._build(profile)
+        try:
+            yield ydl
+        finally:
+            with self._lock:
+                if generation == self._generation and len(self._idle[profile]) < self.max_idle:
+                    self._idle[profile].append(ydl)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "idle": {profile: len(idle) for profile, idle in self._idle.items()},
+            }
+
+ytdl_pool = YTDLPool(max_idle=config.YTDL_POOL_SIZE)
+
+def _is_playlist_url(url):
+    return "://" in url and ('list=' in url or 'playlist' in url or 'start_radio' in url)
+
+def _is_flat_entry(info):
+    return info.get("_type") in ("url", "url_transparent")
+
+_VIDEO_ID_RE = re.compile(r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/)|youtu\.be/)([A-Za-z0-9_-]{11})')
+_EXPIRE_RE = re.compile(r'[?&/]expire[=/](\d+)')
+
+def video_id_from_url(url):
+    match = _VIDEO_ID_RE.search(url)
+    return match.group(1) if match else None
+
+def stream_url_expiry(url):
+    """Returns the unix timestamp from a googlevideo URL's expire parameter, or None."""
+    match = _EXPIRE_RE.search(url or "")
+    return int(match.group(1)) if match else None
+
+class ResolutionCache:
+    """
+    Caches resolved track metadata by video ID and normalized search query, so repeated
+    requests across guilds skip yt-dlp. Entries expire with their stream URL.
+    """
+    # Only the fields YTDLSource reads are kept; the full info dict can be hundreds of KB.
+    FIELDS = ("id", "title", "url", "duration", "thumbnail", "webpage_url", "acodec")
+
+    def __init__(self, max_bytes, path=None, expiry_margin=600, default_ttl=3600):
+        self.path = path
+        self.expiry_margin = expiry_margin
+        self.default_ttl = default_ttl
+        self._cache = TTLCache(max_bytes=max_bytes)
+
+    @staticmethod
+    def normalize_query(query):
+        return " ".join(query.lower().split())
+
+    def _key_for(self, url):
+        if _is_playlist_url(url):
+            return None
+        video_id = video_id_from_url(url)
+        if video_id:
+            return f"id:{video_id}"
+        if "://" not in url:
+            return f"q:{self.normalize_query(url)}"
+        return None
+
+    def lookup(self, url):
+        key = self._key_for(url)
+        if key is None:
+            return None
+        if key.startswith("q:"):
+            video_id = self._cache.get(key)
+            if video_id is None:
+                return None
+            key = f"id:{video_id}"
+        return self._cache.get(key)
+
+    def _expires_at(self, info):
+        expire = stream_url_expiry(info.get("url"))
+        if expire is not None:
+            return expire - self.expiry_margin
+        return time.time() + self.default_ttl
+
+    def _put(self, info):
+        if not info or not info.get("id") or not info.get("url") or _is_flat_entry(info):
+            return None
+        entry = {field: info.get(field) for field in self.FIELDS}
+        expires_at = self._expires_at(entry)
+        if expires_at <= time.time():
+            return None
+        key = f"id:{entry['id']}"
+        self._cache.set(key, entry, expires_at=expires_at, size=len(json.dumps(entry)))
+        return entry
+
+    def store(self, url, data):
+        """Caches every entry of a yt-dlp result and aliases a search query to its first result."""
+        entries = data.get("entries") if "entries" in data else [data]
+        first = None
+        for info in entries or []:
+            entry = self._put(info)
+            if first is None:
+                first = entry
+        key = self._key_for(url)
+        if first is not None and key is not None and key.startswith("q:"):
+            self._cache.set(key, first["id"], expires_at=self._expires_at(first), size=len(key))
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            now = time.time()
+            for key, value, expires_at, size in saved:
+                if expires_at is None or expires_at > now:
+                    self._cache.set(key, value, expires_at=expires_at, size=size)
+            logging.info(f"ResolutionCache: Loaded {len(self._cache)} entries from {self.path}")
+        except Exception as e:
+            logging.error(f"ResolutionCache: Failed to load {self.path}: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._cache.items(), f)
+            os.replace(tmp_path, self.path)
+            logging.info(f"ResolutionCache: Saved {len(self._cache)} entries to {self.path}")
+        except Exception as e:
+            logging.error(f"ResolutionCache: Failed to save {self.path}: {e}")
+
+    def stats(self):
+        return self._cache.stats()
+
+resolution_cache = ResolutionCache(
+    max_bytes=config.RESOLUTION_CACHE_MAX_BYTES,
+    path=config.RESOLUTION_CACHE_PATH or None,
+)
+
+def _extract_info(url, *, profile, download, ytdl_opts=None):
+    if ytdl_opts is not None:
+        return yt_dlp.YoutubeDL(ytdl_opts).extract_info(url, download=download)
+    with ytdl_pool.acquire(profile) as ydl:
+        return ydl.extract_info(url, download=download)
+
+# --- Process extraction mode ---
+# With EXTRACTION_MODE = "process", stream extraction runs in long-lived worker processes so yt-dlp's
+# CPU work doesn't hold the GIL that the voice send threads need. Each worker keeps its own ytdl_pool.
+
+# Fields YTDLSource and the caches read; the rest of yt-dlp's info dict stays in the worker
+COMPACT_FIELDS = ResolutionCache.FIELDS + ("_type", "filepath")
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+def _compact_info(info):
+    compact = {field: info[field] for field in COMPACT_FIELDS if info.get(field) is not None}
+    thumbnails = info.get("thumbnails")
+    if "thumbnail" not in compact and thumbnails:
+        compact["thumbnail"] = thumbnails[-1].get("url")
+    return compact
+
+def _init_extraction_process():
+    # Build the YoutubeDL instances up front so the first job doesn't pay for it
+    for profile in ("stream", "playlist"):
+        with ytdl_pool.acquire(profile):
+            pass
+
+def _extract_compact(url, profile):
+    """Runs in a worker process. Returns the compact fields of the result only."""
+    try:
+        data = _extract_info(url, profile=profile, download=False)
+    except Exception as e:
+        # yt-dlp's exceptions don't all survive pickling back to the bot process
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+    if "entries" in data:
+        return {"entries": [_compact_info(entry) for entry in data["entries"] if entry]}
+    return _compact_info(data)
+
+def _get_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn rather than fork: the bot process has running threads that must not be forked
+            _process_pool = ProcessPoolExecutor(
+                max_workers=config.EXTRACTION_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_extraction_process,
+            )
+        return _process_pool
+
+def start_extraction_processes():
+    """Starts and warms the worker processes ahead of the first request."""
+    pool = _get_process_pool()
+    for _ in range(config.EXTRACTION_PROCESSES):
+        pool.submit(os.getpid)
+    logging.info(f"Started {config.EXTRACTION_PROCESSES} extraction worker processes.")
+
+def shutdown_extraction_processes():
+    global _process_pool
+    with _process_pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _extract_in_process(url, profile):
+    """Runs on an extraction executor thread, which keeps priorities and fairness, and waits on a worker process."""
+    try:
+        return _get_process_pool().submit(_extract_compact, url, profile).result()
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); the next job starts fresh processes
+        logging.error("Extraction worker process died, restarting the process pool.")
+        shutdown_extraction_processes()
+        raise
+
+audio_cache = AudioCache(max_bytes=config.AUDIO_CACHE_MAX_BYTES)
+
+loudness_store = LoudnessStore(config.LOUDNESS_DB_PATH)
+loudness_analyzer = LoudnessAnalyzer(loudness_store, workers=config.LOUDNESS_ANALYSIS_WORKERS)
+
+extraction_executor = ExtractionExecutor(workers=config.EXTRACTION_WORKERS)
+
+def _download_to_cache(url, profile="download"):
+    """Downloads a track and moves it into the audio cache. Runs in an executor or DownloadPool thread."""
+    video_id = video_id_from_url(url)
+    with audio_cache.download_lock(video_id or url):
+        # Another guild may have finished the same download while this one waited
+        cached = audio_cache.lookup(video_id, count=False) if video_id else None
+        if cached is not None:
+            return cached
+        data = _extract_info(url, profile=profile, download=True)
+        for entry in data.get("entries") or [data]:
+            if not entry or not entry.get("id"):
+                continue
+            downloads = entry.get("requested_downloads") or [{}]
+            path = downloads[0].get("filepath") or entry.get("filepath")
+            if path and os.path.isfile(path):
+                entry["filepath"] = audio_cache.add(entry, path)
+                if config.LOUDNESS_NORMALIZATION:
+                    loudness_analyzer.submit(entry["id"], entry["filepath"])
+        return data
+
+predownloader = DownloadPool(lambda url: _download_to_cache(url, profile="predownload"), workers=config.PREDOWNLOAD_WORKERS)
+
 class YTDLSource:
+    """
+    A queued track. Only the fields playback needs are kept from yt-dlp's info dict, which can run to
+    hundreds of KB per track with every format, thumbnail and caption; use fetch_info() for the rest.
+    """
+    FIELDS = ("id", "title", "url", "expires_at", "duration", "thumbnail", "webpage_url", "acodec", "resolved", "is_local")
+    __slots__ = FIELDS + ("_resolve_task",)
+
     def __init__(self, data):
-        self.data = data
+        self._resolve_task = None
+        self._set_data(data)
+
+    def __repr__(self):
+        return f"<YTDLSource id={self.id!r} title={self.title!r} resolved={self.resolved}>"
+
+    def _set_data(self, data):
+        self.id = data.get("id")
+        # Flat playlist entries only carry the watch URL; the stream URL is filled in by resolve()
+        self.resolved = not _is_flat_entry(data)
         self.title = data.get("title")
-        self.url = data.get("filepath") or data.get("url")
+        self.url = (data.get("filepath") or data.get("url")) if self.resolved else None
+        self.expires_at = stream_url_expiry(self.url)
+        # Played from the audio cache rather than streamed
+        self.is_local = bool(self.resolved and data.get("filepath"))
         self.duration = data.get("duration")
-        self.thumbnail = data.get("thumbnail")
-        self.webpage_url = data.get("webpage_url")
+        self.acodec = data.get("acodec") if self.resolved else None
+        thumbnails = data.get("thumbnails")
+        self.thumbnail = data.get("thumbnail") or (thumbnails[-1].get("url") if thumbnails else None)
+        self.webpage_url = data.get("webpage_url") or (data.get("url") if not self.resolved else None)
+
+    def _copy_from(self, other):
+        for field in self.FIELDS:
+            setattr(self, field, getattr(other, field))
+
+    def use_local_copy(self):
+        """Switches to the audio cache's copy of this track if it has been downloaded. Returns True if it did."""
+        video_id = self.id
+        if self.is_local or not video_id:
+            return False
+        local = audio_cache.lookup(video_id)
+        if local is None:
+            return False
+        self._set_data(local)
+        return True
+
+    def expires_within(self, seconds):
+        """True if the stream URL's expire= timestamp falls within the next `seconds`."""
+        return self.expires_at is not None and self.expires_at - time.time() < seconds
+
+    async def fetch_info(self, *, loop=None, priority=INTERACTIVE, guild_id=None):
+        """Extracts the full yt-dlp info dict again, for features that need more than this record keeps."""
+        return await extraction_executor.run(
+            lambda: _extract_info(self.webpage_url, profile="stream", download=False),
+            priority=priority, guild_id=guild_id, loop=loop,
+        )
+
+    async def resolve(self, *, loop=None, force=False, priority=INTERACTIVE, guild_id=None):
+        """
+        Resolves a lazy playlist placeholder to a playable stream. Safe to call concurrently.
+        With force=True, an already resolved entry is re-extracted to get a fresh stream URL.
+        Concurrent callers share the first caller's extraction job and its priority.
+        """
+        if self.resolved and not force:
+            return self
+        if self._resolve_task is None or self._resolve_task.done():
+            self._resolve_task = asyncio.ensure_future(self._resolve(loop, use_cache=not force, priority=priority, guild_id=guild_id))
+        await asyncio.shield(self._resolve_task)
+        return self
+
+    async def _resolve(self, loop, use_cache=True, priority=INTERACTIVE, guild_id=None):
+        results = await YTDLSource.from_url(self.webpage_url, loop=loop, use_cache=use_cache, priority=priority, guild_id=guild_id)
+        if not results or not results[0].resolved:
+            raise ValueError(f"Could not resolve a stream for {self.webpage_url}")
+        self._copy_from(results[0])
+        logging.info(f"YTDLSource.resolve: Resolved lazy entry {self.title}")
+
+    @classmethod
+    async def from_urls(cls, urls, *, loop=None, priority=INTERACTIVE, guild_id=None, concurrency=3):
+        """
+        Resolves several URLs or search queries concurrently, at most `concurrency` at a time.
+        Returns (songs, errors): songs in the order submitted, with a playlist URL contributing all of its
+        entries, and a "<url>: <reason>" message for each URL or query that could not be loaded.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def resolve_one(url):
+            async with semaphore:
+                return await cls.from_url(url, loop=loop, priority=priority, guild_id=guild_id)
+
+        results = await asyncio.gather(*(resolve_one(url) for url in urls), return_exceptions=True)
+        songs, errors = [], []
+        for url, result in zip(urls, results):
+            if isinstance(result, BaseException):
+                # A cancelled resolution is one failed URL; cancelling this call raises at the gather instead
+                if not isinstance(result, (Exception, asyncio.CancelledError)):
+                    raise result
+                reason = str(result) or type(result).__name__
+                logging.warning(f"YTDLSource.from_urls: Could not load {url}: {reason}")
+                errors.append(f"{url}: {reason}")
+            elif not result:
+                errors.append(f"{url}: No results found")
+            else:
+                songs.extend(result)
+        return songs, errors
 
     @classmethod
-    async def from_url(cls, url, *, loop=None, ytdl_opts=None):
-        loop = loop or asyncio.get_event_loop()
-        
+    async def from_url(cls, url, *, loop=None, ytdl_opts=None, use_cache=True, priority=INTERACTIVE, guild_id=None):
+        """
+        Extracts a URL or search query into a list of YTDLSource. yt-dlp runs on the extraction executor
+        at the given priority, queued fairly against other guilds' jobs.
+        """
+        run = lambda fn: extraction_executor.run(fn, priority=priority, guild_id=guild_id, loop=loop)
+
+        if ytdl_opts is None and use_cache:
+            cached = resolution_cache.lookup(url)
+            video_id = video_id_from_url(url) or (cached or {}).get("id")
+            local = audio_cache.lookup(video_id) if video_id else None
+            if local is not None:
+                logging.info(f"YTDLSource.from_url: Audio cache hit for {url}")
+                return [cls(local)]
+            if cached is not None:
+                logging.info(f"YTDLSource.from_url: Resolution cache hit for {url}")
+                return [cls(cached)]
+
         try:
             # Try to stream first
-            options = ytdl_opts if ytdl_opts is not None else YTDL_STREAM_FORMAT_OPTIONS.copy()
-            data = await loop.run_in_executor(None, lambda: yt_dlp.YoutubeDL(options).extract_info(url, download=False))
+            profile = "playlist" if _is_playlist_url(url) else "stream"
+            if ytdl_opts is None and config.EXTRACTION_MODE == "process":
+                data = await run(lambda: _extract_in_process(url, profile))
+            else:
+                data = await run(lambda: _extract_info(url, profile=profile, download=False, ytdl_opts=ytdl_opts))
             logging.info(f"YTDLSource.from_url: Streaming successful for {url}")
+            if ytdl_opts is None:
+                resolution_cache.store(url, data)
         except Exception as e:
             logging.warning(f"Streaming failed for {url}: {e}. Falling back to download.")
             # If streaming fails, download the audio
-            options = ytdl_opts if ytdl_opts is not None else YTDL_DOWNLOAD_FORMAT_OPTIONS.copy()
-            data = await loop.run_in_executor(None, lambda: yt_dlp.YoutubeDL(options).extract_info(url, download=True))
+            if ytdl_opts is None:
+                data = await run(lambda: _download_to_cache(url))
+            else:
+                data = await run(lambda: _extract_info(url, profile="download", download=True, ytdl_opts=ytdl_opts))
             logging.info(f"YTDLSource.from_url: Download and extraction complete for {url}")
 
         logging.info(f"YTDLSource.from_url raw yt-dlp data keys: {data.keys() if isinstance(data, dict) else 'N/A'}")
@@ -75,6 +538,6 @@ class YTDLSource:
             logging.info(f"YTDLSource.from_url number of entries: {len(data.get('entries', []))}")
 
         if "entries" in data:
-            return [cls(entry) for entry in data["entries"]]
+            return [cls(entry) for entry in data["entries"] if entry]
         else:
             return [cls(data)]
@@ -22,6 +22,104 @@ QUEUE_EMOJI = '🎵'
 ERROR_EMOJI = '❌'
 SUCCESS_EMOJI = '✅'
 
+# Extensions left out of startup. One is loaded by the first use of a command in its LAZY_EXTENSION_COMMANDS entry,
+# or in the background LAZY_EXTENSIONS_WARMUP_DELAY seconds after the bot is ready (negative: only on demand)
+LAZY_EXTENSIONS = [name.strip() for name in os.environ.get("LAZY_EXTENSIONS", "cogs.ai").split(",") if name.strip()]
+LAZY_EXTENSION_COMMANDS = {
+    "cogs.ai": ("minigpt", "view_files"),
+}
+LAZY_EXTENSIONS_WARMUP_DELAY = float(os.environ.get("LAZY_EXTENSIONS_WARMUP_DELAY", 60))
+# Seconds from launch to on_ready that startup should stay under; a longer startup is logged as a warning
+STARTUP_TARGET_SECONDS = float(os.environ.get("STARTUP_TARGET_SECONDS", 5))
+
+# Number of idle yt-dlp extractor instances kept per option profile (stream, download, playlist)
+YTDL_POOL_SIZE = int(os.environ.get("YTDL_POOL_SIZE", 4))
+
+# Resolved track metadata cache (keyed by video ID and search query)
+RESOLUTION_CACHE_MAX_BYTES = int(os.environ.get("RESOLUTION_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+# Set to an empty string to keep the cache in memory only
+RESOLUTION_CACHE_PATH = os.environ.get("RESOLUTION_CACHE_PATH", "yt_dlp_cache/resolution_cache.json")
+
+# Number of upcoming lazy playlist entries resolved to stream URLs ahead of playback
+PLAYLIST_RESOLVE_AHEAD = int(os.environ.get("PLAYLIST_RESOLVE_AHEAD", 2))
+
+# Seconds before the current track ends at which the next track's ffmpeg process is started
+PREFETCH_LEAD_SECONDS = float(os.environ.get("PREFETCH_LEAD_SECONDS", 10))
+
+# Stream URLs expire a few hours after extraction. Queued songs starting within STREAM_URL_REFRESH_WINDOW seconds are
+# re-resolved if their URL would expire before they finish (plus STREAM_URL_EXPIRY_MARGIN seconds)
+STREAM_URL_REFRESH_WINDOW = int(os.environ.get("STREAM_URL_REFRESH_WINDOW", 1800))
+STREAM_URL_EXPIRY_MARGIN = int(os.environ.get("STREAM_URL_EXPIRY_MARGIN", 120))
+
+# Track transitions through the in-process crossfade mixer: seconds of crossfade, 0 to play tracks back to back
+# with no gap, or empty to start each track in its own player. ?crossfade overrides it per guild
+CROSSFADE_SECONDS = float(os.environ["CROSSFADE_SECONDS"]) if os.environ.get("CROSSFADE_SECONDS") else None
+CROSSFADE_MAX_SECONDS = float(os.environ.get("CROSSFADE_MAX_SECONDS", 12))
+
+# ?playmany: most requests per command, and how many are resolved at once
+PLAYMANY_MAX_ITEMS = int(os.environ.get("PLAYMANY_MAX_ITEMS", 50))
+PLAYMANY_CONCURRENCY = int(os.environ.get("PLAYMANY_CONCURRENCY", 3))
+
+# Worker threads for yt-dlp extraction, shared by all guilds
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", 4))
+# "process" runs stream extraction in EXTRACTION_PROCESSES long-lived worker processes instead of threads
+EXTRACTION_MODE = os.environ.get("EXTRACTION_MODE", "thread").lower()
+EXTRACTION_PROCESSES = int(os.environ.get("EXTRACTION_PROCESSES", 2))
+
+# Downloaded audio kept in audio_cache/: total size budget (least recently played files are evicted first),
+# and how long an unplayed file is kept before the cleaner removes it
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get("AUDIO_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+AUDIO_CACHE_MAX_IDLE_HOURS = float(os.environ.get("AUDIO_CACHE_MAX_IDLE_HOURS", 72))
+
+# Background downloads of the next queued tracks into the audio cache: how many per guild, how many at once,
+# and the rate limit per download in bytes/s (0 for none), so the total is at most workers * ratelimit
+PREDOWNLOAD_AHEAD = int(os.environ.get("PREDOWNLOAD_AHEAD", 3))
+PREDOWNLOAD_WORKERS = int(os.environ.get("PREDOWNLOAD_WORKERS", 2))
+PREDOWNLOAD_RATELIMIT = int(os.environ.get("PREDOWNLOAD_RATELIMIT", 2 * 1024 * 1024))
+
+# Loudness normalization: decoded tracks are brought towards LOUDNESS_TARGET (LUFS) by at most LOUDNESS_MAX_GAIN_DB.
+# Downloaded tracks are measured with ffmpeg's ebur128 filter by LOUDNESS_ANALYSIS_WORKERS background threads, others
+# while they play, and the results are kept in LOUDNESS_DB_PATH. Normalizing decodes every track, so it turns Opus passthrough off
+LOUDNESS_NORMALIZATION = os.environ.get("LOUDNESS_NORMALIZATION", "false").lower() in ("1", "true", "yes")
+LOUDNESS_TARGET = float(os.environ.get("LOUDNESS_TARGET", -14))
+LOUDNESS_MAX_GAIN_DB = float(os.environ.get("LOUDNESS_MAX_GAIN_DB", 12))
+LOUDNESS_DB_PATH = os.environ.get("LOUDNESS_DB_PATH", "yt_dlp_cache/loudness.sqlite3")
+LOUDNESS_ANALYSIS_WORKERS = int(os.environ.get("LOUDNESS_ANALYSIS_WORKERS", 1))
+
+# Send Opus audio to discord at normal volume instead of decoding to PCM for the volume control: copied as-is at
+# normal speed, encoded by ffmpeg after atempo otherwise
+OPUS_PASSTHROUGH = os.environ.get("OPUS_PASSTHROUGH", "true").lower() in ("1", "true", "yes")
+
+# YouTube Data API search: daily quota in units (a search costs 100), and the result cache
+YOUTUBE_API_DAILY_QUOTA = int(os.environ.get("YOUTUBE_API_DAILY_QUOTA", 10000))
+YOUTUBE_SEARCH_CACHE_TTL = int(os.environ.get("YOUTUBE_SEARCH_CACHE_TTL", 21600))
+YOUTUBE_SEARCH_CACHE_SIZE = int(os.environ.get("YOUTUBE_SEARCH_CACHE_SIZE", 256))
+
+# Seconds between refreshes of each guild's nowplaying message
+NOWPLAYING_UPDATE_INTERVAL = float(os.environ.get("NOWPLAYING_UPDATE_INTERVAL", 25))
+
+# Local language models are loaded on first use and unloaded after MODEL_IDLE_TIMEOUT idle seconds.
+# Generated text is cached by prompt and generation parameters
+MODEL_IDLE_TIMEOUT = int(os.environ.get("MODEL_IDLE_TIMEOUT", 1800))
+# Inference backend for local models: "torch" (float32), "int8" (dynamically quantized PyTorch) or "onnx"
+# (ONNX Runtime, needs optimum[onnxruntime]; the export is kept in MODEL_ONNX_DIR)
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "torch").lower()
+MODEL_ONNX_DIR = os.environ.get("MODEL_ONNX_DIR", "models/onnx")
+MODEL_PROMPT_CACHE_SIZE = int(os.environ.get("MODEL_PROMPT_CACHE_SIZE", 256))
+MODEL_PROMPT_CACHE_TTL = int(os.environ.get("MODEL_PROMPT_CACHE_TTL", 3600))
+
+# ?minigpt: tokens generated per prompt, and the inference worker's batching. Prompts arriving within
+# INFERENCE_MAX_WAIT_MS of each other are generated together, up to INFERENCE_MAX_BATCH at once;
+# beyond INFERENCE_MAX_QUEUE waiting prompts new ones are turned away
+MINIGPT_MAX_NEW_TOKENS = int(os.environ.get("MINIGPT_MAX_NEW_TOKENS", 40))
+INFERENCE_MAX_BATCH = int(os.environ.get("INFERENCE_MAX_BATCH", 8))
+INFERENCE_MAX_WAIT_MS = float(os.environ.get("INFERENCE_MAX_WAIT_MS", 50))
+INFERENCE_MAX_QUEUE = int(os.environ.get("INFERENCE_MAX_QUEUE", 32))
+# Stream ?minigpt's answer into one message as it is generated, editing it at most every MINIGPT_EDIT_INTERVAL seconds
+# Streamed prompts are batched by the inference worker like the others
+MINIGPT_STREAMING = os.environ.get("MINIGPT_STREAMING", "true").lower() in ("1", "true", "yes")
+MINIGPT_EDIT_INTERVAL = float(os.environ.get("MINIGPT_EDIT_INTERVAL", 1.0))
+
 # Discord Channel ID for sending bot logs (errors, warnings)
 LOG_CHANNEL_ID = int(os.environ.get("LOG_CHANNEL_ID"))
 
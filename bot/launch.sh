@@ -75,7 +75,7 @@ setup_environment() {
 start_bot() {
     # Run the cache cleaner
     echo "Running audio cache cleaner..."
-    "$VENV_PYTHON" "utils/cleaner.py"
+    "$VENV_PYTHON" -m utils.cleaner
 
     if screen -list | grep -q "$SESSION_NAME"; then
         echo "Bot is already running."
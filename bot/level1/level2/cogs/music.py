@@ -28,6 +28,10 @@ class Music(commands.Cog):
         self.nowplaying_tasks = {}
         self.current_volume = {}
         self.inactivity_timers = {}
+        self.queue_buffer = QueueBuffer()
+
+    async def cog_unload(self):
+        await self.queue_buffer.close()
 
     async def get_queue(self, guild_id):
         if guild_id not in self.song_queues:
@@ -164,9 +168,12 @@ class Music(commands.Cog):
                 return await ctx.send(embed=self.create_embed("Error", f"{config.ERROR_EMOJI} Could not fetch any songs. Please check the URL or search query.", discord.Color.red()))
 
             # 4. Buffer and queue songs
-            buffer = QueueBuffer()
-            playable_songs, unplayable_songs = buffer.test_playlist(songs)
-            logging.info(f"Found {len(playable_songs)} playable and {len(unplayable_songs)} unplayable songs.")
+            playable_songs, unplayable_songs, unknown_songs = await self.queue_buffer.test_playlist(songs)
+            logging.info(f"Found {len(playable_songs)} playable, {len(unplayable_songs)} unplayable and {len(unknown_songs)} unchecked songs.")
+            # Songs whose probe timed out are kept; a slow host isn't proof the stream is dead
+            if unknown_songs:
+                unplayable = {id(song) for song in unplayable_songs}
+                playable_songs = [song for song in songs if id(song) not in unplayable]
 
             if not playable_songs:
                 return await ctx.send(embed=self.create_embed("Error", f"{config.ERROR_EMOJI} No playable songs found.", discord.Color.red()))
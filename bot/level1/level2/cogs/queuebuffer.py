@@ -1,8 +1,31 @@
 import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import aiohttp
 
 class QueueBuffer:
-    def __init__(self):
+    """
+    Checks that songs can actually be streamed before they are queued. Stream URLs are probed concurrently
+    with a one-byte range request over a shared session, limited overall and per host, and results are
+    cached so re-queueing the same songs doesn't probe them again. A probe's timeout only starts once it has
+    its slot, so a long playlist waiting its turn doesn't time out in the queue.
+    """
+    def __init__(self, concurrency=20, per_host=6, timeout=5, cache_ttl=600, cache_size=5000):
         self.buffer = asyncio.Queue()
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # url -> (playable, expires_at)
+        self._session = None
+        self._slots = asyncio.Semaphore(concurrency)
+        self._host_slots = {}  # host -> Semaphore(per_host)
+        self.stats = {"probed": 0, "cached": 0, "playable": 0, "unplayable": 0, "unknown": 0, "timeouts": 0}
 
     async def add_to_buffer(self, item):
         await self.buffer.put(item)
@@ -13,15 +36,95 @@ class QueueBuffer:
     def is_empty(self):
         return self.buffer.empty()
 
-    def test_playlist(self, songs):
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+            # Probes are timed by _probe once they hold a slot, not while they wait for a connection
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=None))
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def _cached(self, url):
+        entry = self._cache.get(url)
+        if entry is None:
+            return None
+        playable, expires_at = entry
+        if expires_at <= time.time():
+            del self._cache[url]
+            return None
+        self._cache.move_to_end(url)
+        return playable
+
+    def _remember(self, url, playable):
+        self._cache[url] = (playable, time.time() + self.cache_ttl)
+        self._cache.move_to_end(url)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _request(self, url, headers):
+        async with self._get_session().get(url, headers=headers, allow_redirects=True) as response:
+            return response.status
+
+    async def _probe(self, song):
+        """True if the song can be streamed, False if not, None if that couldn't be told in time."""
+        url = song.url
+        if not url:
+            return False
+        if not urlparse(url).scheme.startswith("http"):
+            # Downloaded files
+            return os.path.exists(url)
+
+        cached = self._cached(url)
+        if cached is not None:
+            self.stats["cached"] += 1
+            return cached
+
+        headers = dict(song.data.get("http_headers") or {})
+        headers["Range"] = "bytes=0-0"
+        host = urlparse(url).hostname
+        host_slots = self._host_slots.setdefault(host, asyncio.Semaphore(self.per_host))
+        try:
+            # The host's slot first, so a busy host doesn't hold overall slots other hosts could use
+            async with host_slots, self._slots:
+                self.stats["probed"] += 1
+                status = await asyncio.wait_for(self._request(url, headers), self.timeout)
+            playable = status in (200, 206)
+            if not playable:
+                logging.info(f"QueueBuffer: {song.title} is not playable (HTTP {status}).")
+        except asyncio.TimeoutError:
+            # A slow host isn't proof the stream is dead, so the result is unknown and not cached
+            self.stats["timeouts"] += 1
+            logging.warning(f"QueueBuffer: Probe for {song.title} timed out.")
+            return None
+        except aiohttp.ClientError as e:
+            logging.info(f"QueueBuffer: {song.title} is not playable ({e}).")
+            playable = False
+        self._remember(url, playable)
+        return playable
+
+    async def test_playlist(self, songs):
+        """
+        Returns (playable_songs, unplayable_songs, unknown_songs), each in the original order.
+        Unknown songs are the ones whose probe timed out.
+        """
+        results = await asyncio.gather(*(self._probe(song) for song in songs))
         playable_songs = []
         unplayable_songs = []
-        for song in songs:
-            if song.url:
+        unknown_songs = []
+        for song, playable in zip(songs, results):
+            if playable is None:
+                unknown_songs.append(song)
+            elif playable:
                 playable_songs.append(song)
             else:
                 unplayable_songs.append(song)
-        return playable_songs, unplayable_songs
+        self.stats["playable"] += len(playable_songs)
+        self.stats["unplayable"] += len(unplayable_songs)
+        self.stats["unknown"] += len(unknown_songs)
+        return playable_songs, unplayable_songs, unknown_songs
 
 async def setup(bot):
     pass
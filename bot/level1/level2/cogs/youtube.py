@@ -39,6 +39,7 @@ class YTDLSource:
 
     @classmethod
     async def from_url(cls, url, *, loop=None, ytdl_opts=None):
+        """Returns (songs, errors): the loaded entries and a message for each playlist entry that could not be loaded."""
         loop = loop or asyncio.get_event_loop()
         
         options = ytdl_opts if ytdl_opts is not None else YTDL_FORMAT_OPTIONS.copy()
@@ -51,9 +52,16 @@ class YTDLSource:
             logging.info(f"YTDLSource.from_url number of entries: {len(data.get('entries', []))}")
 
         if "entries" in data:
-            return [cls(entry) for entry in data["entries"]]
+            songs, errors = [], []
+            for index, entry in enumerate(data["entries"], start=1):
+                if entry:
+                    songs.append(cls(entry))
+                else:
+                    # yt-dlp yields None for entries it skipped with ignoreerrors
+                    errors.append(f"Entry {index} could not be loaded.")
+            return songs, errors
         else:
-            return [cls(data)]
+            return [cls(data)], []
 
 async def setup(bot):
     pass
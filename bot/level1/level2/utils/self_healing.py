@@ -5,19 +5,14 @@ import sys
 from discord.ext import tasks, commands
 import config
 from .db_utils import log_healing_event, initialize_db
-from transformers import AutoModelForCausalLM, AutoTokenizer
+from utils.model_registry import model_registry
 
 class SelfHealing(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         initialize_db()
-        try:
-            self.tokenizer = AutoTokenizer.from_pretrained("distilgpt2")
-            self.model = AutoModelForCausalLM.from_pretrained("distilgpt2")
-        except Exception as e:
-            logging.error(f"Failed to load DistilGPT-2 model: {e}")
-            self.model = None
-            self.tokenizer = None
+        # Shares ?minigpt's DistilGPT-2 instance, loaded on the first error summary
+        self.model_name = "distilgpt2"
         self.health_check.start()
 
     def cog_unload(self):
@@ -58,15 +53,14 @@ class SelfHealing(commands.Cog):
         os.execv(sys.executable, ['python'] + sys.argv)
 
     def generate_error_summary(self, error_message):
-        if not self.model or not self.tokenizer:
-            return "Local AI model not available. Cannot generate error summary."
-        
         prompt = f"Summarize the following Python error and suggest a potential cause:\n\n{error_message}\n\nSummary:"
         try:
-            inputs = self.tokenizer(prompt, return_tensors="pt", max_length=512, truncation=True)
-            outputs = self.model.generate(**inputs, max_length=100, num_beams=5, early_stopping=True)
-            summary = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            return summary
+            # Repeated errors are answered from the registry's prompt cache
+            return model_registry.generate(self.model_name, prompt, tokenizer_kwargs={"max_length": 512, "truncation": True},
+                                           max_length=100, num_beams=5, early_stopping=True)
+        except OSError as e:
+            logging.error(f"Failed to load DistilGPT-2 model: {e}")
+            return "Local AI model not available. Cannot generate error summary."
         except Exception as e:
             logging.error(f"Error generating summary with local AI: {e}")
             return "Failed to generate error summary."
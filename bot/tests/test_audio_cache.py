@@ -0,0 +1,23 @@
+import os
+
+from utils.audio_cache import AudioCache
+
+def add(cache, tmp_path, video_id, size=6):
+    path = tmp_path / f"incoming-{video_id}.webm"
+    path.write_bytes(b"x" * size)
+    return cache.add({"id": video_id, "title": video_id}, str(path))
+
+def test_evict_removes_least_recently_played_files(tmp_path):
+    (tmp_path / "cache").mkdir()
+    cache = AudioCache(str(tmp_path / "cache"), max_bytes=13)
+    try:
+        first = add(cache, tmp_path, "a")
+        second = add(cache, tmp_path, "b")
+        assert cache.lookup("a") is not None
+        add(cache, tmp_path, "c")
+        assert os.path.exists(first)
+        assert not os.path.exists(second)
+        assert cache.lookup("b") is None
+        assert cache.stats()["evictions"] == 1
+    finally:
+        cache.close()
@@ -0,0 +1,38 @@
+import threading
+import time
+
+from utils import loudness
+from utils.loudness import LoudnessAnalyzer, LoudnessStore
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_playback_measurements_do_not_wait_behind_analysis(tmp_path, monkeypatch):
+    release = threading.Event()
+
+    def measure(path):
+        release.wait(5)
+        return -10.0, -1.0
+
+    monkeypatch.setattr(loudness, "measure_ebur128", measure)
+    store = LoudnessStore(str(tmp_path / "loudness.sqlite3"))
+    analyzer = LoudnessAnalyzer(store, workers=1)
+    try:
+        assert analyzer.submit("slow", "slow.webm")
+        assert not analyzer.submit("slow", "slow.webm")
+        analyzer.record("live", -20.0, -3.0)
+        wait_for(lambda: store.get("live") is not None)
+        assert store.get("slow") is None
+        release.set()
+        wait_for(lambda: analyzer.pending() == 0)
+        assert store.get("slow") == (-10.0, -1.0, "ebur128")
+        # Already measured by ebur128, so the pool skips it without running ffmpeg
+        assert analyzer.submit("slow", "slow.webm")
+        wait_for(lambda: analyzer.pending() == 0)
+        assert analyzer.stats["skipped"] == 1
+    finally:
+        release.set()
+        store.close()
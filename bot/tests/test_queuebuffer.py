@@ -0,0 +1,68 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+
+from level1.level2.cogs.queuebuffer import QueueBuffer
+
+def song(url, title):
+    return SimpleNamespace(url=url, title=title, data={})
+
+async def serve(delay):
+    async def stream(request):
+        await asyncio.sleep(delay)
+        return web.Response(status=206, body=b"x")
+
+    async def slow(request):
+        await asyncio.sleep(2)
+        return web.Response(status=206, body=b"x")
+
+    async def missing(request):
+        return web.Response(status=404)
+
+    app = web.Application()
+    app.router.add_get("/stream/{n}", stream)
+    app.router.add_get("/slow", slow)
+    app.router.add_get("/missing", missing)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+def test_probes_beyond_the_connector_limit_do_not_time_out_while_queued():
+    async def run():
+        runner, base = await serve(delay=0.2)
+        buffer = QueueBuffer(concurrency=20, per_host=6, timeout=1)
+        try:
+            # 60 probes through 6 connections take about 2s, twice the per-probe timeout
+            songs = [song(f"{base}/stream/{n}", f"song {n}") for n in range(60)]
+            return await buffer.test_playlist(songs), buffer.stats
+        finally:
+            await buffer.close()
+            await runner.cleanup()
+
+    (playable, unplayable, unknown), stats = asyncio.run(run())
+    assert len(playable) == 60
+    assert not unplayable and not unknown
+    assert stats["timeouts"] == 0
+
+def test_timeouts_are_unknown_and_errors_unplayable():
+    async def run():
+        runner, base = await serve(delay=0)
+        buffer = QueueBuffer(timeout=0.5)
+        try:
+            songs = [song(f"{base}/stream/1", "ok"), song(f"{base}/slow", "slow"), song(f"{base}/missing", "missing")]
+            return await buffer.test_playlist(songs)
+        finally:
+            await buffer.close()
+            await runner.cleanup()
+
+    playable, unplayable, unknown = asyncio.run(run())
+    assert [s.title for s in playable] == ["ok"]
+    assert [s.title for s in unplayable] == ["missing"]
+    assert [s.title for s in unknown] == ["slow"]
@@ -0,0 +1,48 @@
+import asyncio
+import sys
+
+import pytest
+
+pytest.importorskip("discord")
+import discord
+from discord.ext import commands
+
+from utils.startup import LazyExtensions
+
+EXTENSION = '''
+from discord.ext import commands
+
+class Deferred(commands.Cog):
+    @commands.command(aliases=["ping2"])
+    async def ping(self, ctx):
+        pass
+
+    @commands.command()
+    async def untracked(self, ctx):
+        pass
+
+async def setup(bot):
+    await bot.add_cog(Deferred())
+'''
+
+def test_only_commands_in_the_table_load_a_lazy_extension(tmp_path, monkeypatch, caplog):
+    (tmp_path / "deferred_ext.py").write_text(EXTENSION)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    async def run():
+        bot = commands.Bot(command_prefix="?", intents=discord.Intents.none())
+        lazy = LazyExtensions(bot, ["deferred_ext"], commands={"deferred_ext": ("ping", "ping2")})
+        assert lazy.extension_for("typo") is None
+        assert lazy.extension_for("ping2") == "deferred_ext"
+        await lazy.load(lazy.extension_for("ping"))
+        loaded = bot.get_command("ping") is not None
+        await bot.close()
+        return lazy, loaded
+
+    lazy, loaded = asyncio.run(run())
+    sys.modules.pop("deferred_ext", None)
+    assert loaded
+    assert lazy.pending == []
+    assert lazy.extension_for("ping") is None
+    # Commands left out of the table are reported
+    assert "untracked" in caplog.text
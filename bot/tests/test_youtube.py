@@ -0,0 +1,43 @@
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault("BOT_OWNER_ID", "0")
+os.environ.setdefault("LOG_CHANNEL_ID", "0")
+pytest.importorskip("discord")
+pytest.importorskip("yt_dlp")
+
+from cogs.youtube import YTDLSource
+
+def test_from_urls_reports_a_cancelled_resolution_as_a_failed_url(monkeypatch):
+    async def from_url(url, **kwargs):
+        if url == "cancelled":
+            # Only this inner resolution is cancelled, not the from_urls call
+            task = asyncio.current_task()
+            asyncio.get_running_loop().call_soon(task.cancel)
+            await asyncio.sleep(1)
+        if url == "broken":
+            raise ValueError("no formats")
+        await asyncio.sleep(0)
+        return [url]
+
+    monkeypatch.setattr(YTDLSource, "from_url", staticmethod(from_url))
+    songs, errors = asyncio.run(YTDLSource.from_urls(["a", "cancelled", "broken", "b"]))
+    assert songs == ["a", "b"]
+    assert errors == ["cancelled: CancelledError", "broken: no formats"]
+
+def test_from_urls_propagates_its_own_cancellation(monkeypatch):
+    async def from_url(url, **kwargs):
+        await asyncio.sleep(1)
+        return [url]
+
+    async def run():
+        task = asyncio.create_task(YTDLSource.from_urls(["a", "b"]))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await task
+
+    monkeypatch.setattr(YTDLSource, "from_url", staticmethod(from_url))
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(run())
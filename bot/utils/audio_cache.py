@@ -0,0 +1,247 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+CACHE_DIR = "audio_cache"
+# yt-dlp downloads land here first and are moved into CACHE_DIR once complete
+INCOMING_DIR = os.path.join(CACHE_DIR, ".incoming")
+INDEX_FILE = "index.sqlite3"
+
+class AudioCache:
+    """
+    Downloaded audio files indexed in SQLite by video ID, with size, codec and last access time.
+    Files are evicted least recently used first once the cache grows past `max_bytes`.
+    Completed downloads are renamed into the cache directory, so an indexed path is always a whole file.
+    Lookups run on the event loop, so the access times they record are kept in memory and written to the
+    index in one transaction by the next add, evict, expire or close.
+    """
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._download_locks = {}
+        self._conn = None
+        self._accessed = {}  # video_id -> (last access, hits) not written to the index yet
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _db(self):
+        # Opened lazily so importing the module does not touch the disk
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.cache_dir, INDEX_FILE), check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS tracks (
+                    video_id TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    acodec TEXT,
+                    title TEXT,
+                    duration REAL,
+                    thumbnail TEXT,
+                    webpage_url TEXT,
+                    added_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS tracks_last_access ON tracks (last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def _flush_accesses(self, db):
+        # Called with the lock held; the caller commits
+        if self._accessed:
+            db.executemany("UPDATE tracks SET last_access = ?, hits = hits + ? WHERE video_id = ?",
+                           [(last_access, hits, video_id) for video_id, (last_access, hits) in self._accessed.items()])
+            self._accessed.clear()
+
+    @contextmanager
+    def download_lock(self, key):
+        """Serializes downloads of the same track across executor threads."""
+        with self._lock:
+            lock, waiters = self._download_locks.get(key, (None, 0))
+            lock = lock or threading.Lock()
+            self._download_locks[key] = (lock, waiters + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, waiters = self._download_locks[key]
+                if waiters > 1:
+                    self._download_locks[key] = (lock, waiters - 1)
+                else:
+                    del self._download_locks[key]
+
+    def contains(self, video_id):
+        """True if the video is indexed. Unlike lookup, this does not count as an access."""
+        with self._lock:
+            return self._db().execute("SELECT 1 FROM tracks WHERE video_id = ?", (video_id,)).fetchone() is not None
+
+    def lookup(self, video_id, count=True):
+        """Returns yt-dlp style info for a cached file, or None. A hit refreshes the entry's last access time in memory."""
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT * FROM tracks WHERE video_id = ?", (video_id,)).fetchone()
+            if row is None:
+                self.misses += count
+                return None
+            if not os.path.isfile(row["path"]):
+                logging.warning(f"AudioCache: Indexed file {row['path']} is missing, dropping it from the index.")
+                db.execute("DELETE FROM tracks WHERE video_id = ?", (video_id,))
+                db.commit()
+                self._accessed.pop(video_id, None)
+                self.misses += count
+                return None
+            _, hits = self._accessed.get(video_id, (None, 0))
+            self._accessed[video_id] = (time.time(), hits + 1)
+            self.hits += count
+        return {
+            "id": row["video_id"],
+            "title": row["title"],
+            "url": row["path"],
+            "filepath": row["path"],
+            "duration": row["duration"],
+            "thumbnail": row["thumbnail"],
+            "webpage_url": row["webpage_url"],
+            "acodec": row["acodec"],
+        }
+
+    def add(self, info, downloaded_path):
+        """Moves a finished download into the cache, indexes it and evicts to the byte budget. Returns the final path."""
+        video_id = info["id"]
+        ext = os.path.splitext(downloaded_path)[1]
+        path = os.path.join(self.cache_dir, f"{video_id}{ext}")
+        os.replace(downloaded_path, path)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            self._flush_accesses(db)
+            self._accessed.pop(video_id, None)
+            previous = db.execute("SELECT path FROM tracks WHERE video_id = ?", (video_id,)).fetchone()
+            if previous and previous["path"] != path:
+                self._remove_file(previous["path"])
+            db.execute(
+                "INSERT OR REPLACE INTO tracks (video_id, path, size, acodec, title, duration, thumbnail, webpage_url, added_at, last_access, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (video_id, path, os.path.getsize(path), info.get("acodec"), info.get("title"), info.get("duration"),
+                 info.get("thumbnail"), info.get("webpage_url"), now, now),
+            )
+            db.commit()
+        logging.info(f"AudioCache: Cached {info.get('title')} ({video_id}) at {path}")
+        self.evict(keep=video_id)
+        return path
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self, max_bytes=None, keep=None):
+        """Deletes least recently used files until the cache fits the byte budget. Returns (files, bytes) removed."""
+        budget = max_bytes if max_bytes is not None else self.max_bytes
+        if budget is None:
+            return 0, 0
+        paths = []
+        freed = 0
+        with self._lock:
+            db = self._db()
+            # Eviction order depends on the access times, so the pending ones are written first
+            if self._accessed:
+                self._flush_accesses(db)
+                db.commit()
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM tracks").fetchone()[0]
+            if total <= budget:
+                return 0, 0
+            for row in db.execute("SELECT video_id, path, size FROM tracks ORDER BY last_access").fetchall():
+                if total <= budget:
+                    break
+                if row["video_id"] == keep:
+                    continue
+                db.execute("DELETE FROM tracks WHERE video_id = ?", (row["video_id"],))
+                paths.append(row["path"])
+                total -= row["size"]
+                freed += row["size"]
+            db.commit()
+            self.evictions += len(paths)
+        # The rows are gone, so lookups already miss; unlinking outside the lock keeps them from waiting on the disk
+        for path in paths:
+            self._remove_file(path)
+        logging.info(f"AudioCache: Evicted {len(paths)} file(s), {freed / 1048576:.1f} MiB freed.")
+        return len(paths), freed
+
+    def expire(self, max_idle_seconds):
+        """Deletes files that have not been played for `max_idle_seconds`. Returns the number removed."""
+        cutoff = time.time() - max_idle_seconds
+        with self._lock:
+            db = self._db()
+            self._flush_accesses(db)
+            rows = db.execute("SELECT video_id, path FROM tracks WHERE last_access < ?", (cutoff,)).fetchall()
+            db.executemany("DELETE FROM tracks WHERE video_id = ?", [(row["video_id"],) for row in rows])
+            db.commit()
+        # Unlinked outside the lock, as in evict
+        for row in rows:
+            self._remove_file(row["path"])
+        return len(rows)
+
+    def sync(self, stale_incoming_seconds=3600):
+        """
+        Reconciles the index with the directory: drops rows whose file is gone, deletes files the index
+        does not know about and removes abandoned partial downloads. Returns the number of files deleted.
+        """
+        deleted = 0
+        with self._lock:
+            db = self._db()
+            indexed = {}
+            for row in db.execute("SELECT video_id, path FROM tracks").fetchall():
+                if os.path.isfile(row["path"]):
+                    indexed[os.path.abspath(row["path"])] = row["video_id"]
+                else:
+                    db.execute("DELETE FROM tracks WHERE video_id = ?", (row["video_id"],))
+            db.commit()
+
+            index_path = os.path.abspath(os.path.join(self.cache_dir, INDEX_FILE))
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    path = os.path.abspath(entry.path)
+                    if not entry.is_file() or path in indexed or path.startswith(index_path):
+                        continue
+                    self._remove_file(entry.path)
+                    deleted += 1
+
+            incoming = os.path.join(self.cache_dir, os.path.basename(INCOMING_DIR))
+            if os.path.isdir(incoming):
+                cutoff = time.time() - stale_incoming_seconds
+                with os.scandir(incoming) as entries:
+                    for entry in entries:
+                        if entry.is_file() and entry.stat().st_mtime < cutoff:
+                            self._remove_file(entry.path)
+                            deleted += 1
+        return deleted
+
+    def stats(self):
+        with self._lock:
+            files, size = self._db().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tracks").fetchone()
+        return {
+            "files": files,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._flush_accesses(self._conn)
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
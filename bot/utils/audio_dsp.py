@@ -0,0 +1,101 @@
+import math
+
+import discord
+import numpy as np
+
+FRAME_SAMPLES = 1920  # 20 ms of 48 kHz stereo, interleaved
+FRAMES_PER_BLOCK = 20  # Loudness is measured over 400 ms blocks, as in EBU R128
+LIMIT_THRESHOLD = 0.9 * 32767  # The soft limiter starts here and bends peaks smoothly into full scale instead of clipping
+LIMIT_HEADROOM = 32767 - LIMIT_THRESHOLD
+
+def loudness_gain(loudness, target, max_gain_db):
+    """The gain in dB that brings a track of `loudness` to `target`, limited to +-max_gain_db."""
+    return max(-max_gain_db, min(max_gain_db, target - loudness))
+
+class DSPAudioSource(discord.AudioSource):
+    """
+    Applies volume, a normalization gain and a soft limiter to a PCM source, in place of PCMVolumeTransformer.
+    Each frame is viewed as int16 samples without copying and processed in preallocated float32 buffers, so
+    the only allocation per frame is the returned bytes. At unity gain frames pass through untouched.
+    With an `on_loudness` callback, the source's loudness before any gain is measured on the way (gated mean
+    square over 400 ms blocks, without R128's K-weighting filter) and passed with its peak to it on cleanup.
+    """
+    def __init__(self, original, volume=1.0, gain_db=0.0, on_loudness=None, min_blocks=25):
+        if original.is_opus():
+            raise discord.ClientException("DSPAudioSource does not work with Opus sources.")
+        self.original = original
+        self.volume = volume
+        self.gain_db = gain_db
+        self.on_loudness = on_loudness
+        self.min_blocks = min_blocks
+        self._work = np.empty(FRAME_SAMPLES, dtype=np.float32)
+        self._magnitude = np.empty(FRAME_SAMPLES, dtype=np.float32)
+        self._out = np.empty(FRAME_SAMPLES, dtype=np.int16)
+        self._block_energy = 0.0
+        self._block_frames = 0
+        self._blocks = []  # Mean square of each 400 ms block, full scale = 1
+        self._peak = 0.0
+
+    @property
+    def gain(self):
+        return self.volume * 10 ** (self.gain_db / 20)
+
+    def _measure(self, work):
+        self._block_energy += float(np.dot(work, work))
+        self._block_frames += 1
+        if self._block_frames == FRAMES_PER_BLOCK:
+            self._blocks.append(self._block_energy / (FRAME_SAMPLES * FRAMES_PER_BLOCK * 32768.0 ** 2))
+            self._block_energy = 0.0
+            self._block_frames = 0
+        self._peak = max(self._peak, float(work.max()), -float(work.min()))
+
+    def _limit(self, work):
+        magnitude = np.abs(work, out=self._magnitude)
+        if magnitude.max() <= LIMIT_THRESHOLD:
+            return
+        over = magnitude > LIMIT_THRESHOLD
+        # Peaks above the threshold are squashed smoothly into the headroom below full scale
+        squashed = LIMIT_THRESHOLD + LIMIT_HEADROOM * np.tanh((magnitude[over] - LIMIT_THRESHOLD) / LIMIT_HEADROOM)
+        work[over] = np.copysign(squashed, work[over])
+
+    def read(self):
+        frame = self.original.read()
+        if len(frame) != FRAME_SAMPLES * 2:
+            return frame
+        measuring = self.on_loudness is not None
+        gain = self.gain
+        if gain == 1.0 and not measuring:
+            return frame
+        work = self._work
+        np.copyto(work, np.frombuffer(frame, dtype=np.int16))
+        if measuring:
+            self._measure(work)
+        if gain == 1.0:
+            return frame
+        work *= gain
+        if gain > 1.0 or self._peak * gain > LIMIT_THRESHOLD:
+            self._limit(work)
+        np.copyto(self._out, work, casting="unsafe")
+        return self._out.tobytes()
+
+    def loudness(self):
+        """Integrated loudness in dB of the audio read so far, or None if too little was read."""
+        if len(self._blocks) < self.min_blocks:
+            return None
+        # Absolute gate at -70, then a relative gate 10 dB below the loudness of what's left
+        blocks = [energy for energy in self._blocks if energy > 10 ** (-70 / 10)]
+        if not blocks:
+            return None
+        relative_gate = sum(blocks) / len(blocks) / 10
+        blocks = [energy for energy in blocks if energy > relative_gate]
+        return -0.691 + 10 * math.log10(sum(blocks) / len(blocks))
+
+    def cleanup(self):
+        self.original.cleanup()
+        if self.on_loudness is not None:
+            loudness = self.loudness()
+            if loudness is not None:
+                peak_db = 20 * math.log10(max(self._peak, 1.0) / 32768)
+                self.on_loudness(loudness, peak_db)
+            # cleanup can be called more than once
+            self.on_loudness = None
@@ -1,7 +1,9 @@
 import os
-import time
 import logging
 
+import config
+from utils.audio_cache import AudioCache, CACHE_DIR
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -12,34 +14,31 @@ logging.basicConfig(
     ]
 )
 
-def clean_audio_cache(cache_dir="audio_cache", max_age_hours=24):
+def clean_audio_cache(cache_dir=CACHE_DIR, max_idle_hours=None, max_bytes=None):
     """
-    Removes files from the audio cache directory that are older than max_age_hours.
+    Cleans the audio cache through its index: drops entries whose file is gone, removes files the index
+    does not know about, expires files not played for max_idle_hours and evicts down to the byte budget.
     """
     if not os.path.isdir(cache_dir):
         logging.warning(f"Cache directory '{cache_dir}' not found.")
         return
 
-    logging.info(f"Starting audio cache cleanup for directory: {cache_dir}")
-    now = time.time()
-    max_age_seconds = max_age_hours * 3600
-    deleted_count = 0
+    max_idle_hours = max_idle_hours if max_idle_hours is not None else config.AUDIO_CACHE_MAX_IDLE_HOURS
+    max_bytes = max_bytes if max_bytes is not None else config.AUDIO_CACHE_MAX_BYTES
 
-    for filename in os.listdir(cache_dir):
-        file_path = os.path.join(cache_dir, filename)
-        try:
-            if os.path.isfile(file_path):
-                file_age = now - os.path.getmtime(file_path)
-                if file_age > max_age_seconds:
-                    os.remove(file_path)
-                    logging.info(f"Deleted old cache file: {filename}")
-                    deleted_count += 1
-        except Exception as e:
-            logging.error(f"Error processing file {file_path}: {e}")
+    logging.info(f"Starting audio cache cleanup for directory: {cache_dir}")
+    cache = AudioCache(cache_dir, max_bytes=max_bytes)
+    try:
+        untracked = cache.sync()
+        expired = cache.expire(max_idle_hours * 3600)
+        evicted, freed = cache.evict()
+        stats = cache.stats()
+    finally:
+        cache.close()
 
-    logging.info(f"Cleanup complete. Deleted {deleted_count} old file(s).")
+    logging.info(f"Cleanup complete. Deleted {untracked} untracked, {expired} expired and {evicted} evicted file(s) "
+                 f"({freed / 1048576:.1f} MiB freed). {stats['files']} file(s), {stats['bytes'] / 1048576:.1f} MiB cached.")
 
 if __name__ == "__main__":
-    # The default cache directory is 'audio_cache' in the same directory as the script.
-    # You can change this if your bot's structure is different.
+    # Run from the bot directory as `python -m utils.cleaner` so the audio cache and config resolve.
     clean_audio_cache()
@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import deque
+
+import discord
+import numpy as np
+
+# discord.AudioSource.read returns 20 ms of 48 kHz 16-bit stereo PCM
+FRAME_BYTES = 3840
+FRAME_SAMPLES = 960
+FRAMES_PER_SECOND = 50
+
+class CrossfadeMixer(discord.AudioSource):
+    """
+    Plays a guild's tracks back to back from one voice player, so the next track starts in the same frame
+    the current one ends instead of after a new ffmpeg process has been spawned.
+    The current track is read up to `fade_frames` ahead, which shows its end before it is heard: the
+    buffered tail is then mixed into the start of the queued next track with equal-power fades. Without a
+    fade the next track's first frame follows the current track's last. Frame math is done with NumPy on
+    whole frames, and the volume is applied here as well.
+    """
+    # Shared by every guild's mixer: CPU time spent in read(), which has to stay well under the 20 ms frame
+    stats = {"frames": 0, "total_ms": 0.0, "max_ms": 0.0, "fade_frames": 0, "fade_total_ms": 0.0, "transitions": 0}
+
+    def __init__(self, source, track, fade_seconds=0.0, volume=1.0, on_advance=None):
+        self.current = source
+        self.track = track
+        self.volume = volume
+        self.on_advance = on_advance
+        self.fade_frames = 0
+        self.set_fade(fade_seconds)
+        self._lock = threading.Lock()
+        self._ahead = deque()  # Frames of the current track read but not played yet
+        self._current_done = False
+        self._next = None  # (source, track)
+        self._outgoing = deque()  # Tail of the previous track, fading out
+        self._fade_length = 0
+        self._fade_position = 0
+        self._mixed = False
+
+    def set_fade(self, seconds):
+        self.fade_frames = int(seconds * FRAMES_PER_SECOND)
+
+    @property
+    def next_track(self):
+        return self._next[1] if self._next else None
+
+    def queue_next(self, source, track):
+        """Sets the source that follows the current track. A previously queued one is cleaned up."""
+        with self._lock:
+            previous, self._next = self._next, (source, track)
+        if previous:
+            previous[0].cleanup()
+
+    def clear_next(self):
+        """Unqueues the next source and returns it, or None if nothing is queued or it has already started."""
+        with self._lock:
+            queued, self._next = self._next, None
+        return queued[0] if queued else None
+
+    def replace_current(self, source):
+        """Swaps the source of the playing track (after a seek or speed change) and returns the old one."""
+        with self._lock:
+            old, self.current = self.current, source
+            # The buffered frames are from the old source's position
+            self._ahead.clear()
+            self._current_done = False
+        return old
+
+    def _fill(self):
+        # Catches up by one extra frame per call, so filling the buffer never stalls playback
+        if self._current_done:
+            return
+        for _ in range(2):
+            if len(self._ahead) > self.fade_frames:
+                return
+            frame = self.current.read()
+            if len(frame) != FRAME_BYTES:
+                self._current_done = True
+                return
+            self._ahead.append(frame)
+
+    def _start_next(self):
+        source, track = self._next
+        self._next = None
+        self._outgoing = self._ahead
+        self._fade_length = len(self._outgoing)
+        self._fade_position = 0
+        self.current.cleanup()
+        self.current, self.track = source, track
+        self._ahead = deque()
+        self._current_done = False
+        self._fill()
+        self.stats["transitions"] += 1
+        return track
+
+    def _scale(self, frame):
+        samples = np.frombuffer(frame, dtype=np.int16) * np.float32(self.volume)
+        return np.clip(samples, -32768, 32767).astype(np.int16).tobytes()
+
+    def _mix(self, outgoing, incoming):
+        # Equal-power fades: cos² + sin² = 1, so the overlap is as loud as either track alone
+        self._mixed = True
+        start = self._fade_position / self._fade_length
+        self._fade_position += 1
+        end = self._fade_position / self._fade_length
+        ramp = np.linspace(start, end, FRAME_SAMPLES, endpoint=False, dtype=np.float32)[:, None] * np.float32(np.pi / 2)
+        fade_out = np.frombuffer(outgoing, dtype=np.int16).reshape(-1, 2) * np.cos(ramp)
+        fade_in = np.frombuffer(incoming, dtype=np.int16).reshape(-1, 2) * np.sin(ramp)
+        mixed = (fade_out + fade_in) * np.float32(self.volume)
+        return np.clip(mixed, -32768, 32767).astype(np.int16).tobytes()
+
+    def _read(self):
+        advanced = None
+        self._fill()
+        if self._current_done and self._next is not None:
+            advanced = self._start_next()
+        if self._ahead:
+            frame = self._ahead.popleft()
+            if self._outgoing:
+                return self._mix(self._outgoing.popleft(), frame), advanced
+        elif self._outgoing:
+            # The next track ended (or failed) before the fade did
+            frame = self._outgoing.popleft()
+        else:
+            return b"", advanced
+        if self.volume != 1.0:
+            frame = self._scale(frame)
+        return frame, advanced
+
+    def read(self):
+        started = time.thread_time()
+        with self._lock:
+            self._mixed = False
+            frame, advanced = self._read()
+            fading = self._mixed
+        elapsed_ms = (time.thread_time() - started) * 1000
+        stats = self.stats
+        stats["frames"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        if fading:
+            stats["fade_frames"] += 1
+            stats["fade_total_ms"] += elapsed_ms
+        if advanced is not None and self.on_advance:
+            self.on_advance(advanced)
+        return frame
+
+    def cleanup(self):
+        with self._lock:
+            sources = [self.current] + ([self._next[0]] if self._next else [])
+            self._next = None
+            self._ahead.clear()
+            self._outgoing.clear()
+        for source in sources:
+            source.cleanup()
@@ -0,0 +1,94 @@
+import heapq
+import itertools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class DownloadPool:
+    """
+    A thread pool that runs `download(url)` for queued tracks in the background.
+    Jobs are keyed by video ID, so the same video queued in several guilds is downloaded once, and the
+    lowest queue position any guild asked for decides its priority. Jobs that no guild wants any more
+    are dropped before they start. Each pool task takes the best job left when it starts, so the priorities
+    are applied at that moment rather than in submission order.
+    """
+    def __init__(self, download, workers=2, name="predownload"):
+        self.download = download
+        self._heap = []  # (priority, seq, video_id)
+        self._jobs = {}  # video_id -> {"url", "priority", "guilds"}
+        self._running = set()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self.stats = {"queued": 0, "completed": 0, "failed": 0, "deduplicated": 0, "dropped": 0}
+
+    def submit(self, video_id, url, priority, guild_id):
+        """Queues a download. Returns False if the video is already queued or downloading."""
+        with self._lock:
+            if video_id in self._running:
+                self.stats["deduplicated"] += 1
+                return False
+            job = self._jobs.get(video_id)
+            if job is not None:
+                job["guilds"].add(guild_id)
+                self.stats["deduplicated"] += 1
+                if priority >= job["priority"]:
+                    return False
+                # Re-push with the better priority; the old heap entry is skipped when popped
+                job["priority"] = priority
+            else:
+                self._jobs[video_id] = {"url": url, "priority": priority, "guilds": {guild_id}}
+                self.stats["queued"] += 1
+            heapq.heappush(self._heap, (priority, next(self._seq), video_id))
+        # One task per push; tasks that find the heap empty (the job was dropped or superseded) return at once
+        self._executor.submit(self._work)
+        return True
+
+    def cancel_guild(self, guild_id, keep=()):
+        """Withdraws a guild's interest in its pending jobs, except for the video IDs in `keep`."""
+        with self._lock:
+            for video_id, job in list(self._jobs.items()):
+                if video_id in keep:
+                    continue
+                job["guilds"].discard(guild_id)
+                if not job["guilds"]:
+                    del self._jobs[video_id]
+                    self.stats["dropped"] += 1
+
+    def clear(self):
+        with self._lock:
+            self.stats["dropped"] += len(self._jobs)
+            self._jobs.clear()
+            self._heap.clear()
+
+    def pending(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def _next_job(self):
+        with self._lock:
+            while self._heap:
+                priority, _, video_id = heapq.heappop(self._heap)
+                job = self._jobs.get(video_id)
+                if job is None or job["priority"] != priority:
+                    continue  # Dropped, or superseded by a better priority
+                del self._jobs[video_id]
+                self._running.add(video_id)
+                return video_id, job["url"]
+            return None
+
+    def _work(self):
+        next_job = self._next_job()
+        if next_job is None:
+            return
+        video_id, url = next_job
+        try:
+            self.download(url)
+            self.stats["completed"] += 1
+            logging.info(f"DownloadPool: Downloaded {video_id} in the background.")
+        except Exception as e:
+            self.stats["failed"] += 1
+            logging.warning(f"DownloadPool: Background download of {video_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(video_id)
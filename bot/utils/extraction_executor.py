@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+# Priority classes, most urgent first
+INTERACTIVE = 0  # A user is waiting: ?play, ?playlist, the song about to start
+PREFETCH = 1  # The next song, while the current one plays
+BULK = 2  # Resolving further ahead in a playlist
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", PREFETCH: "prefetch", BULK: "bulk"}
+
+class ExtractionExecutor:
+    """
+    Worker threads for blocking yt-dlp calls, separate from asyncio's default executor.
+    Jobs come from the most urgent priority class that has any, and within a class the guilds take
+    turns, so one guild resolving a long playlist can't hold up a ?play in another guild.
+    """
+    def __init__(self, workers=4, name="ytdl"):
+        self.workers = workers
+        self.name = name
+        self._queues = {priority: OrderedDict() for priority in PRIORITY_NAMES}  # guild_id -> deque of jobs
+        self._cond = threading.Condition()
+        self._threads = []
+        self.running = 0
+        self.stats = {
+            name: {"submitted": 0, "completed": 0, "failed": 0, "total_wait": 0.0, "max_wait": 0.0}
+            for name in PRIORITY_NAMES.values()
+        }
+
+    def _start(self):
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, *, priority=INTERACTIVE, guild_id=None):
+        """Queues fn() and returns a concurrent.futures.Future for its result."""
+        future = Future()
+        with self._cond:
+            self._queues[priority].setdefault(guild_id, deque()).append((future, fn, time.perf_counter()))
+            self.stats[PRIORITY_NAMES[priority]]["submitted"] += 1
+            self._start()
+            self._cond.notify()
+        return future
+
+    def run(self, fn, *, priority=INTERACTIVE, guild_id=None, loop=None):
+        """Awaitable form of submit. Cancelling the await drops the job if it hasn't started."""
+        return asyncio.wrap_future(self.submit(fn, priority=priority, guild_id=guild_id), loop=loop)
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                for priority, guilds in self._queues.items():
+                    if not guilds:
+                        continue
+                    guild_id, jobs = next(iter(guilds.items()))
+                    job = jobs.popleft()
+                    # Round robin: the guild goes to the back of its class
+                    if jobs:
+                        guilds.move_to_end(guild_id)
+                    else:
+                        del guilds[guild_id]
+                    self.running += 1
+                    return priority, job
+                self._cond.wait()
+
+    def _work(self):
+        while True:
+            priority, (future, fn, queued_at) = self._next_job()
+            stats = self.stats[PRIORITY_NAMES[priority]]
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                wait = time.perf_counter() - queued_at
+                stats["total_wait"] += wait
+                stats["max_wait"] = max(stats["max_wait"], wait)
+                if wait > 5:
+                    logging.warning(f"ExtractionExecutor: A {PRIORITY_NAMES[priority]} job waited {wait:.1f}s for a worker.")
+                try:
+                    result = fn()
+                except Exception as e:
+                    stats["failed"] += 1
+                    future.set_exception(e)
+                else:
+                    stats["completed"] += 1
+                    future.set_result(result)
+            finally:
+                with self._cond:
+                    self.running -= 1
+
+    def queue_depths(self):
+        with self._cond:
+            return {PRIORITY_NAMES[priority]: sum(len(jobs) for jobs in guilds.values()) for priority, guilds in self._queues.items()}
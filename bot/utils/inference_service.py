@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+class InferenceQueueFull(Exception):
+    """Raised by InferenceService.submit when too many prompts are already waiting."""
+    pass
+
+class _Job:
+    __slots__ = ("prompt", "kwargs", "cache_key", "params", "future", "submitted_at", "on_text", "cancelled")
+
+    def __init__(self, prompt, kwargs, cache_key, on_text=None):
+        self.prompt = prompt
+        self.kwargs = kwargs
+        self.cache_key = cache_key
+        # Only prompts with the same generation parameters can share a batch, streamed or not
+        self.params = tuple(sorted(kwargs.items()))
+        self.future = Future()
+        self.submitted_at = time.perf_counter()
+        # Streamed jobs report their text as it is generated and can be stopped early
+        self.on_text = on_text
+        self.cancelled = threading.Event()
+
+class _BatchStreamer:
+    """
+    A generate() streamer for a whole batch; transformers' own streamers only handle one sequence.
+    Each streamed row's tokens are decoded as they come and its text is passed to the job's on_text a word
+    at a time, the way TextStreamer does it.
+    """
+    def __init__(self, batch):
+        self.batch = batch
+        self.tokenizer = None
+        self.tokens = [[] for _ in batch]
+        self.printed = [0] * len(batch)
+        self.chunks = [[] for _ in batch]
+        self.first_token_at = [None] * len(batch)
+        self.finished = [job.on_text is None for job in batch]
+        self._prompt_seen = False
+
+    def put(self, value):
+        # The first call is the (padded) prompts
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+        for row, tokens in enumerate(value.reshape(len(self.batch), -1).tolist()):
+            if self.finished[row]:
+                continue
+            for token in tokens:
+                if token == self.tokenizer.eos_token_id:
+                    # Rows that are done keep receiving padding until the whole batch is
+                    self._flush(row)
+                    self.finished[row] = True
+                    break
+                self.tokens[row].append(token)
+            else:
+                text = self.tokenizer.decode(self.tokens[row], skip_special_tokens=True)
+                if text.endswith("\n"):
+                    self._emit(row, text[self.printed[row]:])
+                    self.tokens[row] = []
+                    self.printed[row] = 0
+                else:
+                    # Hold back the last, possibly unfinished word
+                    printable = text[self.printed[row]:text.rfind(" ") + 1]
+                    self._emit(row, printable)
+                    self.printed[row] += len(printable)
+
+    def _flush(self, row):
+        if self.tokens[row]:
+            text = self.tokenizer.decode(self.tokens[row], skip_special_tokens=True)
+            self._emit(row, text[self.printed[row]:])
+            self.tokens[row] = []
+            self.printed[row] = 0
+
+    def _emit(self, row, text):
+        if text:
+            if self.first_token_at[row] is None:
+                self.first_token_at[row] = time.perf_counter()
+            self.chunks[row].append(text)
+            self.batch[row].on_text(text)
+
+    def end(self):
+        for row in range(len(self.batch)):
+            if not self.finished[row]:
+                self._flush(row)
+                self.finished[row] = True
+
+class InferenceService:
+    """
+    Runs a registry model's generate() on a dedicated worker thread, off the event loop.
+    Prompts that arrive while the worker is busy, or within `max_wait` seconds of each other, are generated
+    together as one left-padded batch of up to `max_batch`. Each prompt gets a future for its text, and
+    submit() refuses new prompts once `max_queue` are waiting. Answers go through the registry's prompt cache.
+    stream() queues a prompt the same way and yields the new text as the model produces it.
+    """
+    def __init__(self, registry, model_name, max_batch=8, max_wait=0.05, max_queue=32, name="inference"):
+        self.registry = registry
+        self.model_name = model_name
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.name = name
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self.stats = {"requests": 0, "cached": 0, "rejected": 0, "failed": 0, "batches": 0, "total_latency": 0.0,
+                      "max_latency": 0.0, "tokens": 0, "generate_seconds": 0.0, "streams": 0, "cancelled": 0,
+                      "total_first_token": 0.0}
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._work, name=self.name, daemon=True)
+            self._thread.start()
+
+    def submit(self, prompt, **generate_kwargs):
+        """Queues a prompt and returns a concurrent.futures.Future for the generated text."""
+        return self._submit(_Job(prompt, generate_kwargs, self.registry.cache_key(self.model_name, prompt, generate_kwargs))).future
+
+    def _submit(self, job):
+        cached = self.registry.prompt_cache.get(job.cache_key)
+        if cached is not None:
+            self.stats["cached"] += 1
+            job.future.set_result(cached)
+            return job
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("InferenceService is closed.")
+            if len(self._queue) >= self.max_queue:
+                self.stats["rejected"] += 1
+                raise InferenceQueueFull(f"{len(self._queue)} prompts are already waiting.")
+            self._queue.append(job)
+            self._start()
+            self._cond.notify()
+        return job
+
+    def generate(self, prompt, *, loop=None, **generate_kwargs):
+        """Awaitable form of submit."""
+        return asyncio.wrap_future(self.submit(prompt, **generate_kwargs), loop=loop)
+
+    async def stream(self, prompt, **generate_kwargs):
+        """
+        Async generator of the text generated after the prompt, in chunks as the worker decodes them.
+        Closing it early (or breaking out of the loop) stops the generation at the next token.
+        """
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue()
+        # Streamed text leaves out the prompt, so it is cached apart from submit()'s answers
+        key = self.registry.cache_key(self.model_name, prompt, dict(generate_kwargs, streamed=True))
+        job = self._submit(_Job(prompt, generate_kwargs, key, on_text=lambda text: loop.call_soon_threadsafe(chunks.put_nowait, text)))
+        done = asyncio.wrap_future(job.future, loop=loop)
+        # Queued behind every chunk, because the worker reports the text before it completes the future
+        done.add_done_callback(lambda _: chunks.put_nowait(None))
+        streamed = False
+        try:
+            while (text := await chunks.get()) is not None:
+                streamed = True
+                yield text
+            result = await done
+            if not streamed and result:
+                # Answered from the cache
+                yield result
+        finally:
+            job.cancelled.set()
+
+    def pending(self):
+        with self._cond:
+            return len(self._queue)
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            first = self._queue.popleft()
+            batch = [first]
+            # The window is counted from the first prompt's arrival, so a backlog is never held back
+            deadline = first.submitted_at + self.max_wait
+            while len(batch) < self.max_batch:
+                match = next((job for job in self._queue if job.params == first.params), None)
+                if match is not None:
+                    self._queue.remove(match)
+                    batch.append(match)
+                    continue
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or self._closed:
+                    break
+                self._cond.wait(remaining)
+            return batch
+
+    def _run_batch(self, batch):
+        # torch is imported on the worker, so loading the AI cog doesn't pay for it
+        import torch
+        streamer = _BatchStreamer(batch) if any(job.on_text is not None for job in batch) else None
+        generate_kwargs = dict(batch[0].kwargs)
+        if streamer is not None:
+            from transformers import StoppingCriteria, StoppingCriteriaList
+
+            class Cancelled(StoppingCriteria):
+                # Per row, so a deleted answer stops without ending the rest of the batch
+                def __call__(self, input_ids, scores, **kwargs):
+                    return torch.tensor([job.cancelled.is_set() for job in batch], dtype=torch.bool, device=input_ids.device)
+
+            generate_kwargs.update(streamer=streamer, stopping_criteria=StoppingCriteriaList([Cancelled()]))
+        # Taken per batch, so the registry can unload the model while ?minigpt is idle
+        with self.registry.use(self.model_name) as (model, tokenizer):
+            # GPT-2 has no padding token, and decoder-only models have to be padded on the left to generate
+            if tokenizer.pad_token is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            tokenizer.padding_side = "left"
+            inputs = tokenizer([job.prompt for job in batch], return_tensors="pt", padding=True)
+            if streamer is not None:
+                streamer.tokenizer = tokenizer
+            started = time.perf_counter()
+            with torch.inference_mode():
+                outputs = model.generate(**inputs, pad_token_id=tokenizer.pad_token_id, **generate_kwargs)
+            elapsed = time.perf_counter() - started
+            prompt_length = inputs["input_ids"].shape[1]
+            # Finished sequences are padded to the longest one in the batch
+            new_tokens = int((outputs[:, prompt_length:] != tokenizer.pad_token_id).sum())
+            texts = tokenizer.batch_decode(outputs, skip_special_tokens=True)
+        if streamer is not None:
+            # Streamed jobs get only the text after their prompt, as it was streamed
+            for row, job in enumerate(batch):
+                if job.on_text is not None:
+                    texts[row] = "".join(streamer.chunks[row])
+                    if streamer.first_token_at[row] is not None:
+                        self.stats["total_first_token"] += streamer.first_token_at[row] - job.submitted_at
+        return texts, new_tokens, elapsed
+
+    def _work(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            stats = self.stats
+            try:
+                texts, new_tokens, elapsed = self._run_batch(batch)
+            except Exception as e:
+                stats["failed"] += len(batch)
+                logging.error(f"InferenceService: Batch of {len(batch)} failed: {e}", exc_info=True)
+                for job in batch:
+                    job.future.set_exception(e)
+                continue
+            stats["batches"] += 1
+            stats["tokens"] += new_tokens
+            stats["generate_seconds"] += elapsed
+            finished_at = time.perf_counter()
+            for job, text in zip(batch, texts):
+                if job.on_text is not None:
+                    stats["streams"] += 1
+                if job.cancelled.is_set():
+                    stats["cancelled"] += 1
+                else:
+                    self.registry.prompt_cache.set(job.cache_key, text)
+                latency = finished_at - job.submitted_at
+                stats["requests"] += 1
+                stats["total_latency"] += latency
+                stats["max_latency"] = max(stats["max_latency"], latency)
+                job.future.set_result(text)
+            logging.info(f"InferenceService: Generated a batch of {len(batch)} in {elapsed:.2f}s, "
+                         f"{new_tokens / elapsed if elapsed else 0:.1f} tokens/s, "
+                         f"latency {max(finished_at - job.submitted_at for job in batch):.2f}s")
+
+    def close(self):
+        """Stops the worker once it has finished the prompts already queued."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
@@ -0,0 +1,146 @@
+import logging
+import os
+import re
+import sqlite3
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ffmpeg's ebur128 summary, printed to stderr once the whole input has been read
+INTEGRATED_RE = re.compile(r"I:\s+(-?[\d.]+|-inf) LUFS")
+PEAK_RE = re.compile(r"Peak:\s+(-?[\d.]+|-inf) dBFS")
+
+# How a measurement was made; a better method replaces a worse one, never the other way round
+METHOD_RANK = {"playback": 0, "ebur128": 1}
+
+class LoudnessStore:
+    """Integrated loudness and peak per video ID, in a small SQLite database."""
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        # Opened lazily so importing the module does not touch the disk
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS loudness (
+                    video_id TEXT PRIMARY KEY,
+                    loudness REAL NOT NULL,
+                    peak REAL,
+                    method TEXT NOT NULL,
+                    measured_at REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def get(self, video_id):
+        """Returns (loudness, peak, method), or None if the track has not been measured."""
+        with self._lock:
+            return self._db().execute("SELECT loudness, peak, method FROM loudness WHERE video_id = ?", (video_id,)).fetchone()
+
+    def put(self, video_id, loudness, peak, method):
+        """Stores a measurement unless the track already has one made with a better method. Returns True if stored."""
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT method FROM loudness WHERE video_id = ?", (video_id,)).fetchone()
+            if row and METHOD_RANK.get(row[0], 0) > METHOD_RANK[method]:
+                return False
+            db.execute("INSERT OR REPLACE INTO loudness (video_id, loudness, peak, method, measured_at) VALUES (?, ?, ?, ?, ?)",
+                       (video_id, loudness, peak, method, time.time()))
+            db.commit()
+        return True
+
+    def count(self):
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM loudness").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def measure_ebur128(path, timeout=600):
+    """Runs ffmpeg's ebur128 filter over a file and returns (integrated loudness in LUFS, true peak in dBFS)."""
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-nostats", "-threads", "1", "-i", path, "-map", "0:a:0",
+         "-filter:a", "ebur128=peak=true", "-f", "null", "-"],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=timeout, text=True, errors="replace",
+    )
+    integrated = INTEGRATED_RE.findall(result.stderr)
+    if result.returncode != 0 or not integrated or integrated[-1] == "-inf":
+        raise RuntimeError(f"ffmpeg ebur128 failed (exit {result.returncode}): {result.stderr.strip()[-300:]}")
+    peaks = PEAK_RE.findall(result.stderr)
+    peak = float(peaks[-1]) if peaks and peaks[-1] != "-inf" else None
+    return float(integrated[-1]), peak
+
+class LoudnessAnalyzer:
+    """
+    A thread pool that measures downloaded tracks with ffmpeg's ebur128 filter and stores the
+    result, so playback only has to look the gain up. A video ID is analyzed once, however often it is submitted.
+    Measurements taken during playback are stored by a separate writer thread, so they never wait behind an analysis.
+    """
+    def __init__(self, store, workers=1, name="loudness"):
+        self.store = store
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{name}-store")
+        self.stats = {"queued": 0, "analyzed": 0, "skipped": 0, "failed": 0}
+
+    def submit(self, video_id, path):
+        """
+        Queues a file for analysis and returns False if it is already queued. Does no I/O, so it can be called
+        from the event loop; tracks that ebur128 has already measured are skipped on the pool.
+        """
+        with self._lock:
+            if video_id in self._pending:
+                return False
+            self._pending.add(video_id)
+            self.stats["queued"] += 1
+        self._executor.submit(self._analyze, video_id, path)
+        return True
+
+    def record(self, video_id, loudness, peak):
+        """
+        Stores a measurement taken during playback on the writer thread. It is called from the voice thread and
+        the event loop, which must not wait for SQLite's commit.
+        """
+        self._writer.submit(self._record, video_id, loudness, peak)
+
+    def _record(self, video_id, loudness, peak):
+        try:
+            # An ebur128 measurement is kept over this one
+            if self.store.put(video_id, loudness, peak, "playback"):
+                logging.info(f"LoudnessAnalyzer: Measured {video_id} during playback: {loudness:.1f} dB, peak {peak:.1f} dB")
+        except Exception as e:
+            logging.warning(f"LoudnessAnalyzer: Storing the playback loudness of {video_id} failed: {e}")
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _analyze(self, video_id, path):
+        try:
+            measured = self.store.get(video_id)
+            if measured is not None and measured[2] == "ebur128":
+                self.stats["skipped"] += 1
+                return
+            started = time.perf_counter()
+            loudness, peak = measure_ebur128(path)
+            self.store.put(video_id, loudness, peak, "ebur128")
+            self.stats["analyzed"] += 1
+            logging.info(f"LoudnessAnalyzer: {video_id} is {loudness:.1f} LUFS, peak {peak} dBFS ({time.perf_counter() - started:.1f}s)")
+        except Exception as e:
+            self.stats["failed"] += 1
+            logging.warning(f"LoudnessAnalyzer: Analysis of {video_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(video_id)
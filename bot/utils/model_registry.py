@@ -0,0 +1,198 @@
+import gc
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+from utils.ttl_cache import TTLCache
+
+# torch: float32 PyTorch. int8: PyTorch with dynamically quantized linear layers.
+# onnx: ONNX Runtime through optimum, exported once with past key/values so generate() reuses the KV cache
+BACKENDS = ("torch", "int8", "onnx")
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+def _quantize_int8(model):
+    """
+    Dynamic int8 quantization of a model's linear layers. GPT-2 style models keep their projections in
+    transformers' Conv1D, a linear layer with a transposed weight, so those are turned into nn.Linear first.
+    """
+    import torch
+    from transformers.pytorch_utils import Conv1D
+    for parent in list(model.modules()):
+        for child_name, child in list(parent.named_children()):
+            if isinstance(child, Conv1D):
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(parent, child_name, linear)
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+class _LoadedModel:
+    __slots__ = ("model", "tokenizer", "backend", "memory_bytes", "last_used", "in_use", "uses", "load_seconds")
+
+    def __init__(self, model, tokenizer, backend, memory_bytes, load_seconds):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.backend = backend
+        self.memory_bytes = memory_bytes
+        self.last_used = time.monotonic()
+        self.in_use = 0
+        self.uses = 0
+        self.load_seconds = load_seconds
+
+class ModelRegistry:
+    """
+    The local language models of the whole process. A model is loaded the first time a cog uses it, with the
+    configured backend, shared by every cog after that, and unloaded once nothing has used it for `idle_timeout`
+    seconds. generate() answers repeated prompts with the same parameters from a cache instead of running the model.
+    """
+    def __init__(self, backend="torch", onnx_dir="models/onnx", idle_timeout=1800, cache_size=256, cache_ttl=3600):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown model backend {backend!r}, expected one of {', '.join(BACKENDS)}.")
+        self.backend = backend
+        self.onnx_dir = onnx_dir
+        self.idle_timeout = idle_timeout
+        self.prompt_cache = TTLCache(max_entries=cache_size, default_ttl=cache_ttl)
+        self._models = {}  # name -> _LoadedModel
+        self._load_locks = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        self.loads = 0
+        self.unloads = 0
+
+    def _load_onnx(self, name):
+        from optimum.onnxruntime import ORTModelForCausalLM
+        export_dir = os.path.join(self.onnx_dir, name.replace("/", "--"))
+        if os.path.isdir(export_dir):
+            return ORTModelForCausalLM.from_pretrained(export_dir, use_cache=True)
+        logging.info(f"ModelRegistry: Exporting {name} to ONNX in {export_dir}, this happens once.")
+        model = ORTModelForCausalLM.from_pretrained(name, export=True, use_cache=True)
+        model.save_pretrained(export_dir)
+        return model
+
+    def _load(self, name):
+        # transformers takes seconds to import, so it is only imported once a model is needed
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        tokenizer = AutoTokenizer.from_pretrained(name)
+        backend = self.backend
+        model = None
+        if backend == "onnx":
+            try:
+                model = self._load_onnx(name)
+            except ImportError:
+                logging.warning(f"ModelRegistry: optimum[onnxruntime] is not installed, loading {name} with PyTorch instead.")
+                backend = "torch"
+        if model is None:
+            model = AutoModelForCausalLM.from_pretrained(name)
+            model.eval()
+            if backend == "int8":
+                model = _quantize_int8(model)
+        # Resident memory the load added, which also covers quantized and ONNX Runtime weights
+        loaded = _LoadedModel(model, tokenizer, backend, max(0, _rss_bytes() - rss_before), time.perf_counter() - started)
+        logging.info(f"ModelRegistry: Loaded {name} ({backend}) in {loaded.load_seconds:.1f}s, {loaded.memory_bytes / 1048576:.0f} MiB")
+        return loaded
+
+    def _get(self, name):
+        with self._lock:
+            loaded = self._models.get(name)
+            if loaded is not None:
+                return loaded
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        # Loading takes a while; other models stay usable, and concurrent users of this one wait for one load
+        with load_lock:
+            with self._lock:
+                loaded = self._models.get(name)
+            if loaded is None:
+                loaded = self._load(name)
+                with self._lock:
+                    self._models[name] = loaded
+                    self.loads += 1
+                    self._start_reaper()
+        return loaded
+
+    @contextmanager
+    def use(self, name):
+        """Yields (model, tokenizer), loading the model if needed. It is not unloaded while in use."""
+        loaded = self._get(name)
+        with self._lock:
+            loaded.in_use += 1
+            loaded.uses += 1
+        try:
+            yield loaded.model, loaded.tokenizer
+        finally:
+            with self._lock:
+                loaded.in_use -= 1
+                loaded.last_used = time.monotonic()
+
+    @staticmethod
+    def cache_key(name, prompt, generate_kwargs):
+        return (name, prompt, tuple(sorted(generate_kwargs.items())))
+
+    def generate(self, name, prompt, tokenizer_kwargs=None, **generate_kwargs):
+        """Blocking: generates text for one prompt, or returns the cached text for the same prompt and parameters."""
+        key = self.cache_key(name, prompt, generate_kwargs)
+        cached = self.prompt_cache.get(key)
+        if cached is not None:
+            return cached
+        import torch
+        with self.use(name) as (model, tokenizer):
+            inputs = tokenizer(prompt, return_tensors="pt", **(tokenizer_kwargs or {}))
+            pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+            with torch.inference_mode():
+                outputs = model.generate(**inputs, pad_token_id=pad_token_id, **generate_kwargs)
+            text = tokenizer.decode(outputs[0], skip_special_tokens=True)
+        self.prompt_cache.set(key, text)
+        return text
+
+    def _start_reaper(self):
+        if self._reaper is None or not self._reaper.is_alive():
+            self._reaper = threading.Thread(target=self._reap, name="model-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        while True:
+            time.sleep(min(60, max(self.idle_timeout, 1)))
+            self.unload_idle()
+            with self._lock:
+                if not self._models:
+                    self._reaper = None
+                    return
+
+    def unload_idle(self, idle_timeout=None):
+        """Unloads models that are not in use and have been idle for `idle_timeout` seconds. Returns their names."""
+        idle_timeout = self.idle_timeout if idle_timeout is None else idle_timeout
+        now = time.monotonic()
+        with self._lock:
+            idle = [name for name, loaded in self._models.items() if not loaded.in_use and now - loaded.last_used >= idle_timeout]
+            for name in idle:
+                del self._models[name]
+            self.unloads += len(idle)
+        if idle:
+            # The models are only freed once nothing refers to them any more
+            gc.collect()
+            logging.info(f"ModelRegistry: Unloaded idle model(s): {', '.join(idle)}")
+        return idle
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            models = {
+                name: {"backend": loaded.backend, "memory_bytes": loaded.memory_bytes, "uses": loaded.uses, "in_use": loaded.in_use,
+                       "idle_seconds": now - loaded.last_used, "load_seconds": loaded.load_seconds}
+                for name, loaded in self._models.items()
+            }
+        return {"models": models, "loads": self.loads, "unloads": self.unloads, "cache": self.prompt_cache.stats()}
+
+model_registry = ModelRegistry(backend=config.MODEL_BACKEND, onnx_dir=config.MODEL_ONNX_DIR, idle_timeout=config.MODEL_IDLE_TIMEOUT,
+                               cache_size=config.MODEL_PROMPT_CACHE_SIZE, cache_ttl=config.MODEL_PROMPT_CACHE_TTL)
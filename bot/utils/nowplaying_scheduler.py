@@ -0,0 +1,132 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+class NowPlayingScheduler:
+    """
+    Refreshes the now-playing message of every playing guild from a single task.
+    Updates are spread out so that at most `max_calls_per_second` REST calls are made overall
+    and a channel is never edited more than once per `channel_min_interval` seconds, which keeps
+    the bot well inside Discord's per-route and global rate limits.
+
+    `update` is a coroutine function taking (guild_id, channel_id) and returning one of
+    "edited", "sent", "deleted", "skipped" or "stopped" ("stopped" untracks the guild).
+    """
+    # REST calls made per result, and what the old fetch_message + edit loop made for the same tick
+    CALL_COSTS = {
+        "edited": (1, 2),
+        "sent": (1, 1),
+        "deleted": (1, 2),
+        "skipped": (0, 2),
+        "stopped": (0, 0),
+    }
+
+    def __init__(self, update, interval=25, max_calls_per_second=4, channel_min_interval=1.0):
+        self.update = update
+        self.interval = interval
+        self.call_spacing = 1.0 / max_calls_per_second
+        self.channel_min_interval = channel_min_interval
+        self._heap = []  # (due_at, token, guild_id)
+        self._tokens = {}  # guild_id -> token of its live heap entry
+        self._channels = {}  # guild_id -> channel_id
+        self._channel_last_call = {}
+        self._last_call = 0.0
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self.stats = {"updates": 0, "edited": 0, "sent": 0, "deleted": 0, "skipped": 0, "rest_calls": 0, "rest_calls_saved": 0}
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    def track(self, guild_id, channel_id, delay=None):
+        """Schedules a guild's now-playing message for periodic updates, replacing any previous schedule."""
+        token = next(self._counter)
+        self._tokens[guild_id] = token
+        self._channels[guild_id] = channel_id
+        due_at = time.monotonic() + (self.interval if delay is None else delay)
+        heapq.heappush(self._heap, (due_at, token, guild_id))
+        self._wakeup.set()
+
+    def untrack(self, guild_id):
+        # The heap entry is left behind and ignored once its token no longer matches
+        self._tokens.pop(guild_id, None)
+        self._channels.pop(guild_id, None)
+
+    def is_tracked(self, guild_id):
+        return guild_id in self._tokens
+
+    async def _wait_until(self, due_at):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, due_at - time.monotonic()))
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while True:
+            try:
+                if not self._heap:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                due_at, token, guild_id = self._heap[0]
+                if self._tokens.get(guild_id) != token:
+                    heapq.heappop(self._heap)
+                    continue
+                if due_at > time.monotonic():
+                    await self._wait_until(due_at)
+                    continue
+
+                channel_id = self._channels[guild_id]
+                # Stagger calls: keep a minimum spacing overall and per channel
+                now = time.monotonic()
+                ready_at = max(self._last_call + self.call_spacing, self._channel_last_call.get(channel_id, 0.0) + self.channel_min_interval)
+                if ready_at > now:
+                    await asyncio.sleep(ready_at - now)
+                    continue
+
+                heapq.heappop(self._heap)
+                result = await self._update(guild_id, channel_id)
+                if self._tokens.get(guild_id) != token:
+                    continue  # Re-tracked or untracked while the update was running
+                if result == "stopped":
+                    self.untrack(guild_id)
+                    continue
+                heapq.heappush(self._heap, (time.monotonic() + self.interval, token, guild_id))
+            except asyncio.CancelledError:
+                logging.info("NowPlayingScheduler: Task cancelled.")
+                break
+            except Exception as e:
+                logging.error(f"NowPlayingScheduler: Unexpected error: {e}", exc_info=True)
+                await asyncio.sleep(5)
+
+    async def _update(self, guild_id, channel_id):
+        try:
+            result = await self.update(guild_id, channel_id)
+        except Exception as e:
+            logging.error(f"NowPlayingScheduler: Error updating guild {guild_id}: {e}", exc_info=True)
+            result = "edited"  # Assume a call was attempted and keep the guild scheduled
+
+        calls, old_calls = self.CALL_COSTS.get(result, (1, 2))
+        if calls:
+            self._last_call = time.monotonic()
+            self._channel_last_call[channel_id] = self._last_call
+        stats = self.stats
+        stats["updates"] += 1
+        if result in stats:
+            stats[result] += 1
+        stats["rest_calls"] += calls
+        stats["rest_calls_saved"] += old_calls - calls
+        if stats["updates"] % 100 == 0:
+            logging.info(f"NowPlayingScheduler: {stats['updates']} updates, {stats['rest_calls']} REST calls made, {stats['rest_calls_saved']} saved ({stats['skipped']} unchanged edits skipped).")
+        return result
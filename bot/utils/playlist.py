@@ -0,0 +1,96 @@
+import itertools
+import random
+from collections import OrderedDict
+
+class GuildPlaylist:
+    """
+    A guild's song queue. Entries live in an insertion-ordered index keyed by a per-queue entry ID,
+    which gives O(1) append, pop from the front and remove-by-ID, in-place shuffle and reordering,
+    and cheap slices for paging. The total duration of queued songs is kept as a running sum.
+    """
+    def __init__(self):
+        self._entries = OrderedDict()  # entry_id -> (song, counted_duration)
+        self._ids = itertools.count(1)
+        self.total_duration = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return (song for song, _ in self._entries.values())
+
+    def empty(self):
+        return not self._entries
+
+    def _add(self, song):
+        entry_id = next(self._ids)
+        # Remember the duration that was counted so removals keep the running total exact,
+        # even if the song's duration is filled in later (e.g. a resolved playlist placeholder).
+        duration = song.duration or 0
+        self._entries[entry_id] = (song, duration)
+        self.total_duration += duration
+        return entry_id
+
+    def append(self, song):
+        return self._add(song)
+
+    def extend(self, songs):
+        return [self._add(song) for song in songs]
+
+    def peek(self):
+        if not self._entries:
+            return None
+        return self._entries[next(iter(self._entries))][0]
+
+    def popleft(self):
+        if not self._entries:
+            raise IndexError("pop from an empty playlist")
+        _, (song, duration) = self._entries.popitem(last=False)
+        self.total_duration -= duration
+        return song
+
+    def remove(self, entry_id):
+        song, duration = self._entries.pop(entry_id)
+        self.total_duration -= duration
+        return song
+
+    def entry_id_at(self, index):
+        if not 0 <= index < len(self._entries):
+            raise IndexError("playlist index out of range")
+        return next(itertools.islice(self._entries, index, None))
+
+    def remove_at(self, index):
+        return self.remove(self.entry_id_at(index))
+
+    def insert(self, index, song):
+        """Inserts a song before position `index`; entries after it are shifted back."""
+        index = max(0, min(index, len(self._entries)))
+        trailing = list(itertools.islice(self._entries, index, None))
+        entry_id = self._add(song)
+        for other_id in trailing:
+            self._entries.move_to_end(other_id)
+        return entry_id
+
+    def move(self, from_index, to_index):
+        entry_id = self.entry_id_at(from_index)
+        song, duration = self._entries.pop(entry_id)
+        to_index = max(0, min(to_index, len(self._entries)))
+        trailing = list(itertools.islice(self._entries, to_index, None))
+        self._entries[entry_id] = (song, duration)
+        for other_id in trailing:
+            self._entries.move_to_end(other_id)
+        return song
+
+    def shuffle(self):
+        items = list(self._entries.items())
+        random.shuffle(items)
+        self._entries.clear()
+        self._entries.update(items)
+
+    def clear(self):
+        self._entries.clear()
+        self.total_duration = 0
+
+    def slice(self, start, stop=None):
+        """Returns the songs in positions [start, stop) without materializing the whole queue."""
+        return [song for song, _ in itertools.islice(self._entries.values(), start, stop)]
@@ -0,0 +1,114 @@
+import asyncio
+import importlib
+import logging
+import time
+from contextlib import contextmanager
+
+class StartupProfile:
+    """
+    Where startup time goes: imports, each cog's setup and the gateway connection, measured from the first line
+    of bot.py. Time-to-first-command is the time until on_ready, when the bot can answer its first command.
+    """
+    def __init__(self, started, target=None):
+        self.started = started
+        self.target = target
+        self.phases = []  # (name, seconds) in the order they happened
+        self.ready_after = None
+        self._connect_started = None
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def record(self, name, seconds):
+        self.phases.append((name, seconds))
+
+    def connecting(self):
+        """Called right before bot.start; the gateway phase runs from here to on_ready, login included."""
+        self._connect_started = time.perf_counter()
+
+    def total(self, prefix):
+        return sum(seconds for name, seconds in self.phases if name.startswith(prefix))
+
+    def mark_ready(self):
+        """Records time-to-first-command on the first on_ready. Returns False on reconnects."""
+        if self.ready_after is not None:
+            return False
+        now = time.perf_counter()
+        if self._connect_started is not None:
+            self.record("gateway", now - self._connect_started)
+        self.ready_after = now - self.started
+        return True
+
+    def summary(self):
+        cogs = ", ".join(f"{name[4:]} {seconds:.2f}s" for name, seconds in self.phases if name.startswith("cog "))
+        text = f"import {self.total('import'):.2f}s, cog setup {self.total('cog '):.2f}s ({cogs or 'none'}), gateway connect {self.total('gateway'):.2f}s"
+        if self.ready_after is not None:
+            text += f"; first command possible after {self.ready_after:.2f}s"
+            if self.target:
+                text += f" (target {self.target:.1f}s)"
+        lazy = [f"{name[5:]} {seconds:.2f}s" for name, seconds in self.phases if name.startswith("lazy ")]
+        if lazy:
+            text += f"; loaded later: {', '.join(lazy)}"
+        return text
+
+class LazyExtensions:
+    """
+    Extensions kept out of startup. One is loaded by the first use of a command from its table in `commands`
+    (extension -> command names and aliases), or by warm_up() once the bot is ready. The module is imported on a worker thread first, so its dependencies' imports do
+    not hold up the event loop; load_extension then only has to run the cog's own module.
+    """
+    def __init__(self, bot, names, commands=None, profile=None):
+        self.bot = bot
+        self.pending = [name for name in names if name]
+        self.commands = commands or {}
+        self.profile = profile
+        self._lock = asyncio.Lock()
+        self._warm_up_task = None
+
+    def extension_for(self, command_name):
+        """The pending extension whose command table has `command_name`, or None."""
+        return next((name for name in self.pending if command_name in self.commands.get(name, ())), None)
+
+    def _check_commands(self, name):
+        # A command missing from the table can't trigger the load, so it only works after warm-up
+        loaded = {alias for command in self.bot.walk_commands() if command.module == name
+                  for alias in (command.name, *command.aliases)}
+        missing = loaded - set(self.commands.get(name, ()))
+        if missing:
+            logging.warning(f"LazyExtensions: {name} has commands missing from its command table: {', '.join(sorted(missing))}")
+
+    async def load(self, name):
+        async with self._lock:
+            if name not in self.pending:
+                return
+            self.pending.remove(name)
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(importlib.import_module, name)
+                await self.bot.load_extension(name)
+            except Exception as e:
+                logging.error(f"Failed to load extension {name}: {e}", exc_info=True)
+                return
+            elapsed = time.perf_counter() - started
+            self._check_commands(name)
+            if self.profile is not None:
+                self.profile.record(f"lazy {name}", elapsed)
+            logging.info(f"Lazily loaded extension {name} in {elapsed:.2f}s")
+
+    async def load_all(self):
+        for name in list(self.pending):
+            await self.load(name)
+
+    def warm_up(self, delay):
+        """Loads the pending extensions `delay` seconds from now, in the background. A negative delay disables it."""
+        if delay >= 0 and self.pending and self._warm_up_task is None:
+            self._warm_up_task = asyncio.create_task(self._warm_up(delay))
+
+    async def _warm_up(self, delay):
+        await asyncio.sleep(delay)
+        await self.load_all()
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """
+    A thread-safe LRU cache with per-entry expiry and optional entry-count and size budgets.
+    Expiry times are wall-clock timestamps so entries can be persisted and reloaded.
+    """
+    def __init__(self, max_entries=None, max_bytes=None, default_ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, count=False) is not None
+
+    def _remove(self, key):
+        _, _, size = self._data.pop(key)
+        self.current_bytes -= size
+
+    def get(self, key, default=None, count=True):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                if count:
+                    self.misses += 1
+                return default
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                self.expirations += 1
+                if count:
+                    self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            if count:
+                self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None, size=1, expires_at=None):
+        if expires_at is None:
+            ttl = ttl if ttl is not None else self.default_ttl
+            expires_at = time.time() + ttl if ttl is not None else None
+        if self.max_bytes is not None and size > self.max_bytes:
+            return False
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at, size)
+            self.current_bytes += size
+            while self._data and (
+                (self.max_entries is not None and len(self._data) > self.max_entries)
+                or (self.max_bytes is not None and self.current_bytes > self.max_bytes)
+            ):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+        return True
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data[key][0]
+            self._remove(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def items(self):
+        """Returns (key, value, expires_at, size) tuples for live entries, least recently used first."""
+        now = time.time()
+        with self._lock:
+            return [
+                (key, value, expires_at, size)
+                for key, (value, expires_at, size) in self._data.items()
+                if expires_at is None or expires_at > now
+            ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,131 @@
+import asyncio
+import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+from utils.ttl_cache import TTLCache
+
+try:
+    from zoneinfo import ZoneInfo
+    # The YouTube Data API quota resets at midnight Pacific Time
+    QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+except Exception:
+    QUOTA_TIMEZONE = datetime.timezone.utc
+
+# Quota units charged for one search.list request
+SEARCH_COST = 100
+
+class SearchQuotaExceeded(Exception):
+    pass
+
+@lru_cache(maxsize=8)
+def get_youtube_service(api_key):
+    """
+    Creates and caches a YouTube service object.
+    """
+    logging.info("Creating new YouTube service object.")
+    return build("youtube", "v3", developerKey=api_key, cache_discovery=False)
+
+class YouTubeSearch:
+    """
+    Runs YouTube Data API searches off the event loop. Results are cached per normalized query,
+    concurrent identical searches share one request, and the units spent are counted per quota day
+    so searches stop before the daily quota is exhausted.
+    """
+    def __init__(self, api_key, daily_quota=10000, cache_ttl=21600, cache_size=256):
+        self.api_key = api_key
+        self.daily_quota = daily_quota
+        self.cache = TTLCache(max_entries=cache_size, default_ttl=cache_ttl)
+        # googleapiclient's httplib2 transport is not thread-safe, so the shared service gets one worker
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="youtube-search")
+        self._pending = {}
+        self._quota_lock = threading.Lock()
+        self.quota_day = self._today()
+        self.quota_used = 0
+        self.requests = 0
+
+    @staticmethod
+    def _today():
+        return datetime.datetime.now(QUOTA_TIMEZONE).date()
+
+    @staticmethod
+    def _cache_key(query, max_results):
+        return f"{max_results}:{' '.join(query.lower().split())}"
+
+    def quota_remaining(self):
+        with self._quota_lock:
+            self._roll_quota_day()
+            return max(0, self.daily_quota - self.quota_used)
+
+    def _roll_quota_day(self):
+        today = self._today()
+        if today != self.quota_day:
+            logging.info(f"YouTubeSearch: New quota day {today}, {self.quota_used} units were used on {self.quota_day}.")
+            self.quota_day = today
+            self.quota_used = 0
+
+    def _charge(self, cost):
+        with self._quota_lock:
+            self._roll_quota_day()
+            if self.quota_used + cost > self.daily_quota:
+                raise SearchQuotaExceeded(f"YouTube API daily quota reached ({self.quota_used}/{self.daily_quota} units used).")
+            self.quota_used += cost
+            self.requests += 1
+
+    def _execute_search(self, query, max_results):
+        service = get_youtube_service(self.api_key)
+        response = service.search().list(q=query, part="snippet", maxResults=max_results, type="video").execute()
+        return [(item["snippet"]["title"], item["id"]["videoId"]) for item in (response or {}).get("items", [])]
+
+    async def search(self, query, max_results=10):
+        """Returns a list of (title, video_id) tuples for the query."""
+        key = self._cache_key(query, max_results)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logging.info(f"YouTubeSearch: Cache hit for query: {query}")
+            return cached
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        self._charge(SEARCH_COST)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, self._execute_search, query, max_results)
+        self._pending[key] = future
+        try:
+            videos = await asyncio.shield(future)
+        except HttpError as e:
+            if e.resp is not None and e.resp.status == 403 and "quota" in str(e).lower():
+                # The API says the quota is gone, whatever our own count says
+                with self._quota_lock:
+                    self.quota_used = max(self.quota_used, self.daily_quota)
+                raise SearchQuotaExceeded("YouTube API daily quota reached.") from e
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+        if videos:
+            self.cache.set(key, videos)
+        logging.info(f"YouTubeSearch: {self.quota_used}/{self.daily_quota} quota units used on {self.quota_day}.")
+        return videos
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    def stats(self):
+        stats = self.cache.stats()
+        with self._quota_lock:
+            self._roll_quota_day()
+            stats.update({
+                "requests": self.requests,
+                "quota_used": self.quota_used,
+                "daily_quota": self.daily_quota,
+                "quota_day": str(self.quota_day),
+            })
+        return stats